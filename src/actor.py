@@ -1,33 +1,31 @@
 """
-Defines the actor class and related methods.
+Defines the symbols used to describe actors in puzzle files and
+related helpers.
 """
 
-import string
+WALL = "O"
+ROBOT = "R"
+GENERIC_BOX = "X"
+GENERIC_STORAGE = "S"
+EMPTY = " "
 
+# Standard XSB symbols, used by level collections. A robot or box on a
+# storage stands for both; the storages are always generic.
+XSB_WALL = "#"
+XSB_FLOORS = "-_"
+XSB_PIECES = {
+    "@": ROBOT,
+    "+": ROBOT + GENERIC_STORAGE,
+    "$": GENERIC_BOX,
+    "*": GENERIC_BOX + GENERIC_STORAGE,
+    ".": GENERIC_STORAGE,
+}
+XSB_SYMBOLS = XSB_WALL + XSB_FLOORS + EMPTY + "".join(XSB_PIECES)
 
-class Actor:
-    def __init__(
-        self,
-        symbol: string = "|",
-        y_position: int = -1,
-        x_position: int = -1,
-        standing_on=None,
-    ):
-        # Character (str) representing the actor
-        self.symbol = symbol
-        # Coordinates
-        self.y_position = y_position
-        self.x_position = x_position
-        # If sharing a space with a storage, log that here
-        self.standing_on = standing_on
 
-    def __str__(self):
-        return f"Symbol: {self.symbol} - at position ({self.y_position}, {self.x_position})"
+def is_box(symbol: str):
+    return symbol.isupper() and symbol not in (ROBOT, GENERIC_STORAGE, WALL)
 
 
-def is_box(actor: Actor):
-    return actor.symbol.isupper() and actor.symbol not in ("R", "S")
-
-
-def is_storage(actor: Actor):
-    return actor.symbol.islower() or actor.symbol == "S"
+def is_storage(symbol: str):
+    return symbol.islower() or symbol == GENERIC_STORAGE
@@ -0,0 +1,131 @@
+"""
+Anytime search: Anytime Repairing A* (ARA*). A first solution is found
+quickly with a heavily weighted A* (f = g + w * h); then, while time
+remains, the weight is lowered step by step and the search carries on
+from the states it has already explored, each time finding a solution
+at least as short as the last, until with w = 1 the last one is proven
+optimal (for an admissible heuristic). States that can't lead to a
+shorter solution than the best found so far are pruned all along.
+"""
+
+import heapq
+
+from state import State
+
+ALGORITHMS = ("ARA*", "ara*", "arastar", "ARAStar", "anytime", "Anytime A*")
+
+# Heuristic weight of each pass
+WEIGHTS = (5, 3, 2, 1.5, 1)
+
+
+class AnytimeSearch:
+    """
+    ARA* from a start state. The heuristic is a Heuristic from
+    HeuristicFactory and successors generates the children of a state.
+    """
+
+    def __init__(self, heuristic, successors, weights=WEIGHTS):
+        self.heuristic = heuristic
+        self.successors = successors
+        self.weights = weights
+        # Number of states expanded and generated, over all passes
+        self.iterations = 0
+        self.generated = 0
+        # Weight of the current pass
+        self.weight = weights[0]
+
+    def search(self, start_state: State, on_expand=None, on_solution=None) -> State:
+        """
+        Returns the goal state of the shortest solution found (its
+        parent chain is the path), or None if none was. on_solution(goal
+        state) is called for each solution shorter than the ones before.
+        on_expand(state, fringe) is called for every expanded state; if
+        it returns True, the search stops and the best solution found so
+        far is returned.
+        """
+        start_score = self.heuristic(start_state)
+        if start_score == -1:
+            return None
+
+        # The state each position was reached with in the fewest moves
+        best = {start_state: start_state}
+        # Entries (weighted f, -move count, order, state); order keeps
+        # States themselves from ever being compared
+        fringe = []
+        order = 0
+        incumbent = None
+        bound = float("inf")
+
+        queued = [start_state]
+        for weight in self.weights:
+            self.weight = weight
+            # Requeue everything left over from the previous pass under
+            # the new weight, dropping states superseded since
+            fringe = []
+            for state in queued:
+                if (
+                    best.get(state) is state
+                    and state.move_count + state.heuristic_estimate < bound
+                ):
+                    order += 1
+                    fringe.append(
+                        (
+                            state.move_count + weight * state.heuristic_estimate,
+                            -state.move_count,
+                            order,
+                            state,
+                        )
+                    )
+            heapq.heapify(fringe)
+            closed = set()
+            # States improved after being expanded in this pass, for the
+            # next one
+            inconsistent = []
+
+            # Stop once no queued state could beat the incumbent
+            while fringe and fringe[0][0] < bound:
+                state = heapq.heappop(fringe)[3]
+                if best[state] is not state or state in closed:
+                    continue
+                closed.add(state)
+                self.iterations += 1
+                if on_expand is not None and on_expand(state, fringe):
+                    return incumbent
+
+                if state.is_goal():
+                    incumbent = state
+                    bound = state.move_count
+                    if on_solution is not None:
+                        on_solution(state)
+                    continue
+
+                for new_state in self.successors(state):
+                    self.generated += 1
+                    known = best.get(new_state)
+                    if known is not None and known.move_count <= new_state.move_count:
+                        continue
+                    score = self.heuristic.update(state, new_state)
+                    # A stuck box, or no way to beat the incumbent
+                    if score == -1 or new_state.move_count + score >= bound:
+                        continue
+                    best[new_state] = new_state
+                    if new_state in closed:
+                        inconsistent.append(new_state)
+                    else:
+                        order += 1
+                        heapq.heappush(
+                            fringe,
+                            (
+                                new_state.move_count + weight * score,
+                                -new_state.move_count,
+                                order,
+                                new_state,
+                            ),
+                        )
+
+            queued = [entry[3] for entry in fringe] + inconsistent
+            if not queued:
+                # Nothing left that could lead to a shorter solution
+                break
+
+        return incumbent
@@ -0,0 +1,295 @@
+"""
+Library interface to the solver: solve() takes a puzzle and returns a
+Result instead of printing anything, so other programs can solve
+puzzles without going through the command line. A Session keeps the
+puzzles it has solved warm for the next solve (see service.py, which
+answers solve requests with one).
+
+    from api import Limits, solve
+
+    result = solve("puzzles/medium.txt", "A*", "matching", Limits(10))
+    if result.solved:
+        print(result.moves)
+"""
+
+import os
+import time
+from collections import OrderedDict
+
+import psutil
+
+import deadlock
+from movement import lurd
+from puzzle import initialize_puzzle, parse_level
+from search import search
+from state import State
+
+# Check the time limit every this many states
+TIME_CHECK_INTERVAL = 64
+# Sample memory usage (and check the memory limit) every this many states
+MEMORY_CHECK_INTERVAL = 1024
+
+# Default number of puzzles a Session keeps warm
+MAX_PUZZLES = 64
+
+
+class Limits:
+    """
+    Per-puzzle resource limits; None means unlimited.
+    """
+
+    def __init__(self, time_limit: float = None, memory_limit: int = None):
+        # Wall time in seconds
+        self.time_limit = time_limit
+        # Resident memory in bytes
+        self.memory_limit = memory_limit
+
+
+class Result:
+    """
+    The outcome of solving one puzzle. status is "solved", "unsolvable"
+    (the search ran out of states), "time_limit", "memory_limit" or
+    "error" (with the message in error).
+    """
+
+    def __init__(self, puzzle, algorithm: str, heuristic: str, search_space: str):
+        # The puzzle's file name, or None if it was given some other way
+        self.puzzle = puzzle if isinstance(puzzle, str) else None
+        self.algorithm = algorithm
+        self.heuristic = heuristic
+        self.search_space = search_space
+        self.status = None
+        self.error = None
+        # The solution as single-step states (as print_solution expects)
+        # and as a LURD string, or None if not solved
+        self.path = None
+        self.moves = None
+        # Every solution found, shortest last, as LURD strings (ARA*
+        # finds several; see anytime.py)
+        self.solutions = []
+        # Number of states expanded and generated
+        self.expanded = None
+        self.generated = None
+        # Peak resident memory of the process and its children in bytes
+        self.peak_rss = None
+        # Wall time in seconds
+        self.runtime = None
+
+    @property
+    def solved(self) -> bool:
+        return self.status == "solved"
+
+    def to_dict(self):
+        """
+        The result as a dict ready to be written as JSON (the records
+        batch.py writes).
+        """
+        record = {
+            "puzzle": self.puzzle,
+            "algorithm": self.algorithm,
+            "heuristic": self.heuristic,
+            "search_space": self.search_space,
+        }
+        if self.error is not None:
+            record["error"] = self.error
+        record.update(
+            {
+                "status": self.status,
+                "moves": self.moves,
+                "length": None if self.moves is None else len(self.moves),
+                "nodes_expanded": self.expanded,
+                "nodes_generated": self.generated,
+                "peak_rss": self.peak_rss,
+                "wall_time": round(self.runtime, 4),
+            }
+        )
+        return record
+
+
+class Session:
+    """
+    Solves puzzles one after another, keeping up to max_puzzles of them
+    warm (least recently used go first): each is parsed only once, which
+    is when its Board builds its distance tables, dead squares and
+    Zobrist keys, and it keeps its DeadlockTable, so the patterns one
+    search learns prune the next. A puzzle file is read again if it has
+    changed since.
+    """
+
+    def __init__(self, max_puzzles: int = MAX_PUZZLES):
+        self.max_puzzles = max_puzzles
+        # Puzzle key -> (start state, DeadlockTable)
+        self.puzzles = OrderedDict()
+        self.process = psutil.Process(os.getpid())
+
+    def memory(self) -> int:
+        """
+        Resident memory in bytes of this process and its children (such
+        as HDA* workers).
+        """
+        rss = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return rss
+
+    def puzzle_key(self, puzzle):
+        """
+        The key a puzzle is kept under: a file name and its modification
+        time and size, or the rows of a level.
+        """
+        if isinstance(puzzle, str):
+            status = os.stat(puzzle.partition("#")[0])
+            return puzzle, status.st_mtime_ns, status.st_size
+        return tuple(puzzle)
+
+    def load(self, puzzle):
+        """
+        Returns a fresh start state of the puzzle (a file name as
+        initialize_puzzle takes, the rows of a level, or a State) and
+        its board's DeadlockTable.
+        """
+        if isinstance(puzzle, State):
+            start_state = puzzle
+            table = deadlock.DeadlockTable(start_state.board)
+        else:
+            key = self.puzzle_key(puzzle)
+            entry = self.puzzles.get(key)
+            if entry is not None:
+                self.puzzles.move_to_end(key)
+            else:
+                if isinstance(puzzle, str):
+                    loaded = initialize_puzzle(puzzle)
+                else:
+                    loaded = parse_level(list(puzzle))
+                entry = (loaded, deadlock.DeadlockTable(loaded.board))
+                self.puzzles[key] = entry
+                if len(self.puzzles) > self.max_puzzles:
+                    self.puzzles.popitem(last=False)
+            start_state, table = entry
+        # Searches record heuristic estimates on the start state, so
+        # each one gets its own
+        return (
+            State(
+                start_state.board,
+                start_state.robot,
+                start_state.specific_boxes,
+                start_state.generic_boxes,
+                zobrist=start_state.zobrist,
+            ),
+            table,
+        )
+
+    def forget(self, puzzle=None):
+        """
+        Drops a puzzle (every puzzle by default) from the session.
+        """
+        if puzzle is None:
+            self.puzzles.clear()
+            return
+        key = self.puzzle_key(puzzle)
+        self.puzzles.pop(key, None)
+
+    def solve(
+        self,
+        puzzle,
+        algorithm: str = "A*",
+        heuristic: str = "matching",
+        limits: Limits = None,
+        search_space: str = "pushes",
+        on_solution=None,
+        workers: int = 0,
+    ) -> Result:
+        """
+        Solves the puzzle within its limits. Never raises for a bad
+        puzzle or configuration; the Result says what went wrong. Each
+        solution is added to the Result's solutions as it is found, and
+        passed (as a LURD string) to on_solution along with the seconds
+        elapsed; with ARA*, that is every shorter solution in turn, and
+        a limit returns the shortest so far. HDA* runs on workers
+        processes (0 for one per core).
+        """
+        if limits is None:
+            limits = Limits()
+        result = Result(puzzle, algorithm, heuristic, search_space)
+        start_time = time.time()
+        peak_rss = self.memory()
+        status = None
+        # Expansion counts at the last time and memory checks; counts
+        # can jump between calls (HDA* reports them in bulk)
+        time_checked = memory_checked = 0
+
+        def on_expand(current_state, fringe, iterations):
+            nonlocal peak_rss, status, time_checked, memory_checked
+            if (
+                limits.time_limit is not None
+                and iterations - time_checked >= TIME_CHECK_INTERVAL
+            ):
+                time_checked = iterations
+                if time.time() - start_time > limits.time_limit:
+                    status = "time_limit"
+            if status is None and iterations - memory_checked >= MEMORY_CHECK_INTERVAL:
+                memory_checked = iterations
+                peak_rss = max(peak_rss, self.memory())
+                if limits.memory_limit is not None and peak_rss > limits.memory_limit:
+                    status = "memory_limit"
+            return status is not None
+
+        def on_found(path):
+            moves = lurd(path)
+            result.solutions.append(moves)
+            if on_solution is not None:
+                on_solution(moves, time.time() - start_time)
+
+        try:
+            start_state, table = self.load(puzzle)
+            path, stats = search(
+                start_state,
+                algorithm,
+                heuristic,
+                search_space,
+                on_expand,
+                workers=workers,
+                on_solution=on_found,
+                deadlock_table=table,
+            )
+        except MemoryError:
+            path, stats, status = None, None, "memory_limit"
+        except Exception as error:
+            path, stats, status = None, None, "error"
+            result.error = f"{type(error).__name__}: {error}"
+
+        if path is not None:
+            result.status = "solved"
+            result.path = path
+            result.moves = lurd(path)
+            if not result.solutions or result.solutions[-1] != result.moves:
+                result.solutions.append(result.moves)
+        else:
+            result.status = status or "unsolvable"
+        if stats is not None:
+            result.expanded = stats.expanded
+            result.generated = stats.generated
+        result.peak_rss = max(peak_rss, self.memory())
+        result.runtime = time.time() - start_time
+        return result
+
+
+def solve(
+    puzzle,
+    algorithm: str = "A*",
+    heuristic: str = "matching",
+    limits: Limits = None,
+    search_space: str = "pushes",
+    on_solution=None,
+    workers: int = 0,
+) -> Result:
+    """
+    Solves one puzzle (a file name, the rows of a level, or a State)
+    within its limits; see Session.solve.
+    """
+    return Session(max_puzzles=0).solve(
+        puzzle, algorithm, heuristic, limits, search_space, on_solution, workers
+    )
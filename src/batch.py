@@ -0,0 +1,240 @@
+"""
+Batch solving: solves every puzzle in a set of directories or glob
+patterns on a process pool and streams one JSON Lines record per
+puzzle. There is no progress display; records are written as soon as
+each puzzle finishes.
+
+Usage:
+    python batch.py "puzzles/*.txt" --algorithm A* --heuristic matching
+    python batch.py levels.xsb --time-limit 10
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing as mp
+import multiprocessing.pool
+import os
+import sys
+
+from api import Limits, solve
+from puzzle import (
+    COLLECTION_EXTENSIONS,
+    count_levels,
+    is_collection,
+    locate_level,
+    read_level,
+)
+from search import SEARCH_SPACES
+
+
+class PoolProcess(mp.Process):
+    """
+    Pool worker that is never a daemon, so a search run in it can start
+    processes of its own (HDA*'s workers).
+    """
+
+    @property
+    def daemon(self):
+        return False
+
+    @daemon.setter
+    def daemon(self, value):
+        pass
+
+
+class PoolContext(type(mp.get_context())):
+    Process = PoolProcess
+
+
+def create_pool(workers=None):
+    """
+    Returns a pool that starts a fresh process per task, so memory
+    measurements and limits aren't affected by earlier tasks.
+    """
+    return mp.pool.Pool(workers, maxtasksperchild=1, context=PoolContext())
+
+
+def find_puzzles(patterns):
+    """
+    Expands directories and glob patterns into a sorted list of puzzle
+    files, without duplicates. Collection files are expanded into one
+    "path#n" entry per level (see puzzle.py).
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [
+                match
+                for extension in (".txt",) + COLLECTION_EXTENSIONS
+                for match in glob.glob(os.path.join(pattern, "*" + extension))
+            ]
+        else:
+            matches = glob.glob(pattern)
+        for match in sorted(matches):
+            if match not in files:
+                files.append(match)
+
+    puzzles = []
+    for path in files:
+        if is_collection(path):
+            puzzles.extend(
+                f"{path}#{number}" for number in range(1, count_levels(path) + 1)
+            )
+        else:
+            puzzles.append(path)
+    return puzzles
+
+
+def solve_one(job):
+    """
+    Pool task: parses and solves a single puzzle within its limits and
+    returns its record (a dict ready to be written as JSON).
+    """
+    puzzle, offset, algorithm, heuristic, search_space, limits, search_workers = job
+    level = puzzle
+    if offset is not None:
+        # Read just this level rather than the collection up to it
+        level = read_level(puzzle.partition("#")[0], offset)
+    record = solve(
+        level, algorithm, heuristic, limits, search_space, workers=search_workers
+    ).to_dict()
+    record["puzzle"] = puzzle
+    return record
+
+
+def make_jobs(puzzles, configurations, limits, search_workers=0):
+    """
+    Pool tasks for every (algorithm, heuristic, search space)
+    configuration on every puzzle. A collection level carries its byte
+    offset in the file (see puzzle.level_offsets), found here in one
+    pass over each collection. HDA* runs on search_workers processes
+    in each task (0 for one per core).
+    """
+    return [
+        (
+            puzzle,
+            locate_level(puzzle)[1],
+            algorithm,
+            heuristic,
+            search_space,
+            limits,
+            search_workers,
+        )
+        for puzzle in puzzles
+        for algorithm, heuristic, search_space in configurations
+    ]
+
+
+def search_workers(pool_size: int) -> int:
+    """
+    Number of HDA* workers each of pool_size tasks running at once may
+    start, so that together they use about one process per core.
+    """
+    return max(1, (os.cpu_count() or 1) // pool_size)
+
+
+def solve_batch(puzzles, algorithm, heuristic, search_space, limits, workers=None):
+    """
+    Solves the puzzles on a process pool, yielding each puzzle's record
+    as soon as it is done (in completion order).
+    """
+    pool_size = workers or os.cpu_count() or 1
+    jobs = make_jobs(
+        puzzles,
+        [(algorithm, heuristic, search_space)],
+        limits,
+        search_workers(pool_size),
+    )
+    with create_pool(pool_size) as pool:
+        yield from pool.imap_unordered(solve_one, jobs)
+
+
+def process_args():
+    """
+    Parses arguments from the CLI.
+
+    Returns:
+        A Namespace object where attributes correspond to the
+        defined/provided args.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "puzzles",
+        nargs="+",
+        help="Puzzle directories and/or glob patterns (e.g. 'puzzles/*.txt'); .xsb and .sok collections are solved level by level.",
+    )
+    parser.add_argument(
+        "--algorithm",
+        type=str,
+        default="A*",
+        help="Search algorithm to employ.",
+    )
+    parser.add_argument(
+        "--heuristic",
+        type=str,
+        default="matching",
+        help="State prioritization heuristic (used in GBFS, A* and IDA* only)",
+    )
+    parser.add_argument(
+        "--search-space",
+        type=str,
+        choices=SEARCH_SPACES,
+        default="pushes",
+        help="Expand single robot steps, whole box pushes, or pushes with forced pushes folded into macro moves.",
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=None,
+        help="Seconds allowed per puzzle.",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=float,
+        default=None,
+        help="Megabytes of resident memory allowed per puzzle.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (defaults to the number of CPUs); HDA* shares the CPUs out between them.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="JSON Lines file to write to (defaults to standard output).",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = process_args()
+
+    memory_limit = None
+    if args.memory_limit is not None:
+        memory_limit = int(args.memory_limit * 1024**2)
+    limits = Limits(args.time_limit, memory_limit)
+
+    puzzles = find_puzzles(args.puzzles)
+    output = sys.stdout if args.output is None else open(args.output, "w")
+    try:
+        for record in solve_batch(
+            puzzles,
+            args.algorithm,
+            args.heuristic,
+            args.search_space,
+            limits,
+            args.workers,
+        ):
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Benchmark harness: solves every bundled puzzle under each algorithm and
+heuristic, records how each run performed and writes the results as a
+JSON baseline. Given an earlier baseline, flags every run that got worse
+by more than a threshold.
+
+Usage:
+    python benchmark.py --output baseline.json
+    python benchmark.py --compare baseline.json --output new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import ida
+from batch import Limits, create_pool, find_puzzles, make_jobs, solve_one
+from fringe import FringeFactory
+from heuristics import HeuristicFactory
+from search import SEARCH_SPACES
+
+PUZZLE_DIRECTORY = os.path.join(os.path.dirname(__file__), "..", "puzzles")
+
+# Algorithms that ignore the heuristic, so are only run once per puzzle
+UNINFORMED = ("BFS", "DFS")
+
+# Metrics compared against the baseline; for all of them lower is better
+METRICS = ("wall_time", "nodes_expanded", "nodes_generated", "peak_rss", "length")
+
+
+def configurations(algorithms, heuristics, search_spaces):
+    """
+    Lists every (algorithm, heuristic, search space) to run.
+    """
+    result = []
+    for search_space in search_spaces:
+        for algorithm in algorithms:
+            if algorithm in UNINFORMED:
+                result.append((algorithm, None, search_space))
+            else:
+                for heuristic in heuristics:
+                    result.append((algorithm, heuristic, search_space))
+    return result
+
+
+def run_benchmark(puzzles, configurations, limits: Limits):
+    """
+    Runs every configuration on every puzzle, one at a time so runs
+    don't compete for the CPU, yielding each run's record as it
+    finishes.
+    """
+    jobs = make_jobs(puzzles, configurations, limits)
+    # A fresh process per run, so peak memory is that of the run alone
+    with create_pool(1) as pool:
+        for record in pool.imap(solve_one, jobs):
+            del record["moves"]
+            record["puzzle"] = os.path.basename(record["puzzle"])
+            record["states_per_second"] = None
+            if record["nodes_expanded"] is not None and record["wall_time"] > 0:
+                record["states_per_second"] = round(
+                    record["nodes_expanded"] / record["wall_time"], 1
+                )
+            yield record
+
+
+def record_key(record):
+    """
+    Identifies a run, for matching it against the baseline.
+    """
+    return (
+        record["puzzle"],
+        record["algorithm"],
+        record["heuristic"],
+        record["search_space"],
+    )
+
+
+def compare(baseline, records, threshold: float, min_time: float):
+    """
+    Compares records against the baseline's records. Returns a
+    description of every regression: a puzzle that is no longer solved,
+    or a metric that grew by more than threshold (a fraction). Wall times
+    are only compared when either is at least min_time seconds, as
+    shorter ones are mostly noise.
+    """
+    previous = {record_key(record): record for record in baseline}
+    regressions = []
+    for record in records:
+        old = previous.get(record_key(record))
+        if old is None:
+            continue
+        name = "{} {} + {} ({})".format(*record_key(record))
+        if old["status"] == "solved" and record["status"] != "solved":
+            regressions.append(f"{name}: {record['status']} (was solved)")
+            continue
+        if record["status"] != "solved":
+            continue
+        for metric in METRICS:
+            before, after = old.get(metric), record.get(metric)
+            if before is None or after is None:
+                continue
+            if metric == "wall_time" and max(before, after) < min_time:
+                continue
+            if after > before * (1 + threshold):
+                change = (after - before) / before * 100 if before else float("inf")
+                regressions.append(
+                    f"{name}: {metric} {before} -> {after} (+{change:.1f}%)"
+                )
+    return regressions
+
+
+def process_args():
+    """
+    Parses arguments from the CLI.
+
+    Returns:
+        A Namespace object where attributes correspond to the
+        defined/provided args.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "puzzles",
+        nargs="*",
+        default=[PUZZLE_DIRECTORY],
+        help="Puzzle directories and/or glob patterns (defaults to the bundled puzzles).",
+    )
+    parser.add_argument(
+        "--algorithms",
+        nargs="+",
+        default=list(FringeFactory.ALGORITHMS) + [ida.ALGORITHMS[0]],
+        help="Search algorithms to run.",
+    )
+    parser.add_argument(
+        "--heuristics",
+        nargs="+",
+        default=list(HeuristicFactory.HEURISTICS),
+        help="Heuristics to run the informed algorithms with.",
+    )
+    parser.add_argument(
+        "--search-spaces",
+        nargs="+",
+        choices=SEARCH_SPACES,
+        default=list(SEARCH_SPACES),
+        help="Search spaces to run.",
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=10,
+        help="Seconds allowed per run.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="JSON file to write the results to, for use as a baseline.",
+    )
+    parser.add_argument(
+        "--compare",
+        type=str,
+        default=None,
+        help="Baseline JSON file to check the results against.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Fraction a metric may grow by before it counts as a regression.",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.1,
+        help="Wall times below this many seconds aren't compared.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = process_args()
+
+    puzzles = find_puzzles(args.puzzles)
+    runs = configurations(args.algorithms, args.heuristics, args.search_spaces)
+    limits = Limits(args.time_limit)
+
+    records = []
+    for record in run_benchmark(puzzles, runs, limits):
+        records.append(record)
+        print(
+            "{:<20} {:<5} {:<10} {:<7}".format(*map(str, record_key(record))),
+            f"{record['status']:<12}",
+            f"length={record['length']}",
+            f"expanded={record['nodes_expanded']}",
+            f"time={record['wall_time']:.3f}s",
+        )
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "time_limit": args.time_limit,
+                    "results": records,
+                },
+                file,
+                indent=2,
+            )
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(baseline, records, args.threshold, args.min_time)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare}.")
+
+
+if __name__ == "__main__":
+    main()
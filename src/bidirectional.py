@@ -0,0 +1,233 @@
+"""
+Bidirectional search over box pushes. A forward search from the start
+state and a backward search from the goal layouts (undoing pushes with
+"pulls") run side by side, each expanding from whichever fringe is
+smaller; once a state generated by one side has already been seen by
+the other, the two half-paths are stitched into a single solution.
+"""
+
+import itertools
+
+import fringe as fr
+import pushes as pu
+from board import UNREACHABLE
+from state import State
+
+ALGORITHMS = (
+    "Bidirectional",
+    "bidirectional",
+    "bidir",
+    "BiDir",
+    "bidirectional A*",
+    "Bidirectional A*",
+)
+
+
+def goal_states(start_state: State):
+    """
+    Returns the goal states the backward search starts from: every
+    arrangement of the boxes on their storages, with the robot (already
+    normalized) in each region of the level it could end up in.
+    """
+    board = start_state.board
+    if len(board.specific_storages) != len(start_state.specific_boxes):
+        return []
+    # Only cells the robot could walk to with no boxes in the way are
+    # part of the level; anything else is outside the walls
+    inside = pu.reachable(State(board, start_state.robot, (), ()))
+
+    states = []
+    for generic_boxes in itertools.combinations(
+        board.generic_storages, len(start_state.generic_boxes)
+    ):
+        occupied = set(board.specific_storages)
+        occupied.update(generic_boxes)
+        visited = bytearray(board.size)
+        # Cells are visited in increasing order, so the first cell of
+        # each region found is the one normalize() would pick
+        for cell in range(board.size):
+            if not inside[cell] or visited[cell] or cell in occupied:
+                continue
+            state = State(board, cell, board.specific_storages, generic_boxes)
+            region = pu.reachable(state)
+            for other in range(cell, board.size):
+                if region[other]:
+                    visited[other] = 1
+            states.append(state)
+    return states
+
+
+def pull_successors(state: State):
+    """
+    Generates every state the supplied one can be reached from with a
+    single box push, i.e. the states reachable backwards with one pull.
+    Each one's last_move is the direction of the push that undoes the
+    pull.
+    """
+    board = state.board
+    region = pu.reachable(state)
+    for box in state.specific_boxes + state.generic_boxes:
+        for direction, offset in enumerate(board.offsets):
+            # The robot stands next to the box and steps away from it,
+            # dragging the box onto the cell it stood on
+            puller = box - offset
+            if not region[puller] or not region[puller - offset]:
+                continue
+            new_state = State(
+                board=board,
+                robot=state.robot,
+                specific_boxes=state.specific_boxes,
+                generic_boxes=state.generic_boxes,
+                parent=state,
+                last_move=direction,
+                move_count=state.move_count + 1,
+                zobrist=state.zobrist,
+            )
+            new_state.move_robot(puller - offset)
+            new_state.move_box(box, puller)
+            yield pu.normalize(new_state)
+
+
+class StartDistances:
+    """
+    Heuristic for the backward search: the sum over boxes of the fewest
+    pushes that would bring a lone box there from where it started
+    (from any generic box's start, for generic boxes). A box that could
+    never have been pushed to where it is makes the state worthless,
+    scored -1 as the forward heuristics score a stuck box.
+    """
+
+    def __init__(self, start_state: State):
+        board = start_state.board
+        self.specific_distances = tuple(
+            board.push_distances((cell,)) for cell in start_state.specific_boxes
+        )
+        self.generic_distances = board.push_distances(start_state.generic_boxes)
+
+    def __call__(self, state: State):
+        score = 0
+        for distances, box in zip(self.specific_distances, state.specific_boxes):
+            distance = distances[box]
+            if distance == UNREACHABLE:
+                return -1
+            score += distance
+        distances = self.generic_distances
+        for box in state.generic_boxes:
+            distance = distances[box]
+            if distance == UNREACHABLE:
+                return -1
+            score += distance
+        return score
+
+
+class Frontier:
+    """
+    One direction of the search: its fringe, ordered by moves plus
+    heuristic, and every state it has generated.
+    """
+
+    def __init__(self, successors):
+        self.successors = successors
+        self.fringe = fr.PriorityFringe()
+        # Maps each state to itself, so that the other side can get at
+        # this side's copy (and its parent chain) on meeting it
+        self.seen = {}
+
+    def add(self, state: State, score: int):
+        """
+        Marks the state as seen and, unless its score is -1, queues it.
+        """
+        self.seen[state] = state
+        if score != -1:
+            state.heuristic_score = score + state.move_count
+            self.fringe.add(state)
+
+
+class BidirectionalSearch:
+    """
+    Bidirectional search in the push search space. The forward side is
+    scored with the supplied heuristic (a Heuristic from
+    HeuristicFactory), the backward side with StartDistances; successors
+    generates the forward side's children.
+    """
+
+    def __init__(self, heuristic, successors=pu.push_successors):
+        self.heuristic = heuristic
+        self.successors = successors
+        # Number of states expanded and generated, over both sides
+        self.iterations = 0
+        self.generated = 0
+
+    def search(self, start_state: State, on_expand=None) -> State:
+        """
+        Returns a goal state whose parent chain is the push-level
+        solution path, or None if there is no solution. The start state
+        must be normalized (see pushes.normalize). on_expand(state,
+        fringe) is called for every expanded state, fringe being that
+        side's fringe; if it returns True, the search is abandoned.
+        """
+        if start_state.is_goal():
+            return start_state
+
+        forward = Frontier(self.successors)
+        backward = Frontier(pull_successors)
+        start_distances = StartDistances(start_state)
+
+        forward.add(start_state, self.heuristic(start_state))
+        for state in goal_states(start_state):
+            if state == start_state:
+                return start_state
+            backward.add(state, start_distances(state))
+
+        while forward.fringe and backward.fringe:
+            if len(forward.fringe) <= len(backward.fringe):
+                side, other = forward, backward
+            else:
+                side, other = backward, forward
+
+            state = side.fringe.pop()
+            self.iterations += 1
+            if on_expand is not None and on_expand(state, side.fringe):
+                return None
+
+            for new_state in side.successors(state):
+                self.generated += 1
+                if new_state in side.seen:
+                    continue
+                meeting = other.seen.get(new_state)
+                if meeting is not None:
+                    if side is forward:
+                        return self.stitch(new_state, meeting)
+                    return self.stitch(meeting, new_state)
+                if side is forward:
+                    score = self.heuristic.update(state, new_state)
+                else:
+                    score = start_distances(new_state)
+                side.add(new_state, score)
+
+        # One side ran out of states without meeting the other, so no
+        # path joins the start to a goal
+        return None
+
+    def stitch(self, forward_state: State, backward_state: State) -> State:
+        """
+        Extends the forward state's path with the pushes that undo the
+        backward state's pulls, in order, and returns the final (goal)
+        state.
+        """
+        state = forward_state
+        pulled = backward_state
+        while pulled.parent is not None:
+            following = pulled.parent
+            state = State(
+                board=state.board,
+                robot=following.robot,
+                specific_boxes=following.specific_boxes,
+                generic_boxes=following.generic_boxes,
+                parent=state,
+                last_move=pulled.last_move,
+                move_count=state.move_count + 1,
+                zobrist=following.zobrist,
+            )
+            pulled = following
+        return state
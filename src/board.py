@@ -0,0 +1,236 @@
+"""
+Defines the Board class, which holds the static parts of a puzzle.
+"""
+
+import random
+from array import array
+from collections import deque
+
+import actor as act
+
+# Distance-table entry for cells a box can't be pushed to a storage from
+UNREACHABLE = 0xFFFF
+
+# Fixed seed so that Zobrist hashes are the same in every process
+ZOBRIST_SEED = 0x50C0
+
+
+class Board:
+    """
+    The static layout of a puzzle (walls and storages). A Board is
+    built once per puzzle and shared by every State, so states only
+    need to record where the robot and the boxes are.
+
+    Positions are flat cell indices: cell = y * width + x.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        walls,
+        specific_storages,
+        generic_storages,
+        box_symbols,
+        storage_symbols,
+    ):
+        self.width = width
+        self.height = height
+        # bytearray with a 1 for every wall cell
+        self.walls = walls
+        # Cell of each specific storage; the i-th storage belongs to
+        # the i-th specific box
+        self.specific_storages = tuple(specific_storages)
+        self.generic_storages = tuple(sorted(generic_storages))
+        self.generic_storage_set = frozenset(self.generic_storages)
+        # Symbols of the specific boxes and storages (e.g. "A" and "a"),
+        # aligned with the box and storage positions
+        self.box_symbols = tuple(box_symbols)
+        self.storage_symbols = tuple(storage_symbols)
+        # Cell offsets for each direction: north, east, south, west
+        self.offsets = (-width, 1, width, -1)
+
+        # Push distances (ignoring other boxes) from every cell: one
+        # table per generic storage, one to the nearest generic storage,
+        # and one per specific box to its own storage.
+        self.generic_distances = tuple(
+            self.pull_distances((storage,)) for storage in self.generic_storages
+        )
+        self.nearest_generic_distances = self.pull_distances(self.generic_storages)
+        self.specific_distances = tuple(
+            self.pull_distances(self.specific_storages[i : i + 1])
+            for i in range(len(self.box_symbols))
+        )
+
+        # Dead squares: cells from which a box can never be pushed onto
+        # a storage it is allowed to finish on. One bytearray for the
+        # generic boxes, and one per specific box.
+        self.dead_generic = self.dead_squares(self.nearest_generic_distances)
+        self.dead_specific = tuple(
+            self.dead_squares(distances) for distances in self.specific_distances
+        )
+
+        # Tunnels: for each direction, a bytearray with a 1 for every
+        # floor cell whose two neighbours across that direction are walls,
+        # i.e. cells of a corridor one cell wide running that way
+        self.tunnels = tuple(
+            self.tunnel_cells(direction) for direction in range(len(self.offsets))
+        )
+
+        # Zobrist keys: a random 64-bit key for every piece on every
+        # cell. A state's hash is the XOR of the keys of its robot and
+        # boxes, so a move updates it with a couple of XORs.
+        keys = random.Random(ZOBRIST_SEED)
+        self.robot_keys = self.zobrist_keys(keys)
+        self.generic_keys = self.zobrist_keys(keys)
+        self.specific_keys = tuple(
+            self.zobrist_keys(keys) for _ in range(len(self.box_symbols))
+        )
+
+        # Called with the number of pushes refused for putting a box on
+        # a dead square, while a search collects metrics (see
+        # Metrics.dead_push); None otherwise
+        self.on_dead_push = None
+
+        # Pre-rendered background (walls and storages) for __str__
+        self.tiles = [act.WALL if wall else act.EMPTY for wall in walls]
+        for cell in self.generic_storages:
+            self.tiles[cell] = act.GENERIC_STORAGE
+        for symbol, cell in zip(self.storage_symbols, self.specific_storages):
+            self.tiles[cell] = symbol
+
+    @property
+    def size(self) -> int:
+        return self.width * self.height
+
+    def cell(self, y_position: int, x_position: int) -> int:
+        return y_position * self.width + x_position
+
+    def coords(self, cell: int):
+        """
+        Returns the (y, x) coordinates of a cell.
+        """
+        return divmod(cell, self.width)
+
+    def pull_distances(self, storages) -> array:
+        """
+        Returns a flat array holding, for every cell, the fewest pushes
+        needed to move a lone box from that cell onto the nearest of the
+        given storages (UNREACHABLE if it can't be done). Works
+        backwards by "pulling" the box away from each storage: a box can
+        be pulled from a cell onto a neighbour if both that neighbour
+        and the cell behind it (where the robot stands) are not walls.
+        """
+        walls = self.walls
+        distances = array("H", [UNREACHABLE]) * self.size
+        queue = deque()
+        for storage in storages:
+            distances[storage] = 0
+            queue.append(storage)
+
+        while queue:
+            cell = queue.popleft()
+            distance = distances[cell] + 1
+            for offset in self.offsets:
+                previous = cell - offset
+                if (
+                    distances[previous] == UNREACHABLE
+                    and not walls[previous]
+                    and not walls[previous - offset]
+                ):
+                    distances[previous] = distance
+                    queue.append(previous)
+        return distances
+
+    def push_distances(self, sources) -> array:
+        """
+        The forward counterpart of pull_distances(): returns a flat array
+        holding, for every cell, the fewest pushes needed to move a lone
+        box onto that cell from the nearest of the given source cells
+        (UNREACHABLE if it can't be done).
+        """
+        walls = self.walls
+        distances = array("H", [UNREACHABLE]) * self.size
+        queue = deque()
+        for source in sources:
+            distances[source] = 0
+            queue.append(source)
+
+        while queue:
+            cell = queue.popleft()
+            distance = distances[cell] + 1
+            for offset in self.offsets:
+                following = cell + offset
+                if (
+                    distances[following] == UNREACHABLE
+                    and not walls[following]
+                    and not walls[cell - offset]
+                ):
+                    distances[following] = distance
+                    queue.append(following)
+        return distances
+
+    def dead_squares(self, distances) -> bytearray:
+        """
+        Given a table from pull_distances(), returns a bytearray with a
+        1 for every floor cell from which a box can never reach any of
+        the storages it was built from.
+        """
+        return bytearray(
+            not wall and distance == UNREACHABLE
+            for wall, distance in zip(self.walls, distances)
+        )
+
+    def tunnel_cells(self, direction: int) -> bytearray:
+        """
+        Returns a bytearray with a 1 for every floor cell with walls on
+        both sides perpendicular to the given direction.
+        """
+        walls = self.walls
+        side = self.offsets[(direction + 1) % 4]
+        tunnels = bytearray(self.size)
+        for cell in range(self.size):
+            if (
+                not walls[cell]
+                and 0 <= cell - side
+                and cell + side < self.size
+                and walls[cell - side]
+                and walls[cell + side]
+            ):
+                tunnels[cell] = 1
+        return tunnels
+
+    def is_storage(self, cell: int) -> bool:
+        return cell in self.generic_storage_set or cell in self.specific_storages
+
+    def zobrist_keys(self, keys: random.Random) -> array:
+        return array("Q", (keys.getrandbits(64) for _ in range(self.size)))
+
+    def zobrist(self, robot: int, specific_boxes, generic_boxes) -> int:
+        """
+        Computes a state's Zobrist hash from scratch.
+        """
+        zobrist = self.robot_keys[robot]
+        for keys, box in zip(self.specific_keys, specific_boxes):
+            zobrist ^= keys[box]
+        for box in generic_boxes:
+            zobrist ^= self.generic_keys[box]
+        return zobrist
+
+    def render(self, robot: int, specific_boxes, generic_boxes) -> str:
+        """
+        Draws the board with the given robot and box positions.
+        """
+        tiles = list(self.tiles)
+        for symbol, cell in zip(self.box_symbols, specific_boxes):
+            tiles[cell] = symbol
+        for cell in generic_boxes:
+            tiles[cell] = act.GENERIC_BOX
+        tiles[robot] = act.ROBOT
+
+        width = self.width
+        rows = [
+            "".join(tiles[start : start + width])
+            for start in range(0, self.size, width)
+        ]
+        return "\n".join(rows) + "\n"
@@ -0,0 +1,169 @@
+"""
+Persistent solution cache: an SQLite file that remembers the solution
+found for each puzzle and search configuration, so solving the same
+puzzle again is instant, and the box configurations proven dead by
+searches that ran out of states, so later searches over the same layout
+can prune them. Both tables are capped, evicting the least recently
+used rows first.
+"""
+
+import hashlib
+import sqlite3
+import time
+from array import array
+
+from state import State
+
+# Default caps on the number of rows kept
+MAX_SOLUTIONS = 4096
+MAX_DEAD = 1 << 20
+
+
+def layout_key(board) -> str:
+    """
+    Hash of a puzzle's static layout: its size, walls and storages.
+    """
+    digest = hashlib.sha256()
+    digest.update(array("I", (board.width, board.height)).tobytes())
+    digest.update(bytes(board.walls))
+    digest.update(array("I", board.specific_storages).tobytes())
+    digest.update(array("I", board.generic_storages).tobytes())
+    digest.update("".join(board.box_symbols + board.storage_symbols).encode())
+    return digest.hexdigest()
+
+
+def state_key(state: State) -> tuple:
+    """
+    The robot and box positions of a state, as one flat tuple.
+    """
+    return (state.robot,) + state.specific_boxes + state.generic_boxes
+
+
+def puzzle_key(start_state: State) -> str:
+    """
+    Hash of a whole puzzle: its layout plus the initial robot and box
+    positions.
+    """
+    digest = hashlib.sha256(layout_key(start_state.board).encode())
+    digest.update(array("I", state_key(start_state)).tobytes())
+    return digest.hexdigest()
+
+
+class SolutionCache:
+    """
+    The cache file. Solutions are stored as lists of directions (as in
+    State.last_move) and dead configurations as state_key() tuples of
+    normalized push-level states.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_solutions: int = MAX_SOLUTIONS,
+        max_dead: int = MAX_DEAD,
+    ):
+        self.max_solutions = max_solutions
+        self.max_dead = max_dead
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS solutions (
+                puzzle TEXT,
+                configuration TEXT,
+                moves BLOB,
+                accessed REAL,
+                PRIMARY KEY (puzzle, configuration)
+            );
+            CREATE TABLE IF NOT EXISTS dead (
+                layout TEXT,
+                configuration BLOB,
+                accessed REAL,
+                PRIMARY KEY (layout, configuration)
+            );
+            CREATE INDEX IF NOT EXISTS solutions_accessed ON solutions (accessed);
+            CREATE INDEX IF NOT EXISTS dead_accessed ON dead (accessed);
+            """
+        )
+
+    def close(self):
+        self.connection.close()
+
+    def get_solution(self, start_state: State, configuration: str):
+        """
+        Returns the cached solution (a list of directions) for the
+        puzzle and configuration, or None.
+        """
+        key = (puzzle_key(start_state), configuration)
+        with self.connection:
+            row = self.connection.execute(
+                "SELECT moves FROM solutions WHERE puzzle = ? AND configuration = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE solutions SET accessed = ? "
+                "WHERE puzzle = ? AND configuration = ?",
+                (time.time(),) + key,
+            )
+        return list(row[0])
+
+    def put_solution(self, start_state: State, configuration: str, moves):
+        """
+        Stores a solution (a list of directions).
+        """
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)",
+                (
+                    puzzle_key(start_state),
+                    configuration,
+                    bytes(moves),
+                    time.time(),
+                ),
+            )
+            self.evict("solutions", self.max_solutions)
+
+    def dead_configurations(self, board) -> set:
+        """
+        Returns the set of dead configurations (state_key() tuples)
+        known for the layout, marking them as used.
+        """
+        layout = layout_key(board)
+        with self.connection:
+            rows = self.connection.execute(
+                "SELECT configuration FROM dead WHERE layout = ?", (layout,)
+            ).fetchall()
+            self.connection.execute(
+                "UPDATE dead SET accessed = ? WHERE layout = ?", (time.time(), layout)
+            )
+        return {tuple(array("I", row[0])) for row in rows}
+
+    def put_dead(self, board, states):
+        """
+        Stores the configurations of normalized push-level states that
+        are known to have no solution.
+        """
+        layout = layout_key(board)
+        accessed = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO dead VALUES (?, ?, ?)",
+                (
+                    (layout, array("I", state_key(state)).tobytes(), accessed)
+                    for state in states
+                ),
+            )
+            self.evict("dead", self.max_dead)
+
+    def evict(self, table: str, limit: int):
+        """
+        Deletes the least recently used rows of a table beyond limit.
+        """
+        (count,) = self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+        if count > limit:
+            self.connection.execute(
+                f"DELETE FROM {table} WHERE rowid IN "
+                f"(SELECT rowid FROM {table} ORDER BY accessed LIMIT ?)",
+                (count - limit,),
+            )
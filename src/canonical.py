@@ -0,0 +1,140 @@
+"""
+Canonical state keys for duplicate detection. Two states are the same
+position if they have the same boxes and their robots are in the same
+region (the robot can walk between them without pushing anything), and,
+when the static map is symmetric, if one is a mirror image of the other.
+"""
+
+import pushes as pu
+from state import State
+
+
+def symmetries(board):
+    """
+    Returns the symmetries of the board's static map, other than the
+    identity: each one an array mapping every cell to its image, that
+    maps walls to walls, generic storages to generic storages and each
+    specific storage to itself.
+    """
+    width, height = board.width, board.height
+    transforms = []
+    for transpose in ((False, True) if width == height else (False,)):
+        for flip_y in (False, True):
+            for flip_x in (False, True):
+                if not (transpose or flip_y or flip_x):
+                    continue
+                image = []
+                for cell in range(board.size):
+                    y_position, x_position = board.coords(cell)
+                    if transpose:
+                        y_position, x_position = x_position, y_position
+                    if flip_y:
+                        y_position = height - 1 - y_position
+                    if flip_x:
+                        x_position = width - 1 - x_position
+                    image.append(board.cell(y_position, x_position))
+                transforms.append(image)
+
+    return [
+        image
+        for image in transforms
+        if all(board.walls[image[cell]] == wall for cell, wall in enumerate(board.walls))
+        and {image[cell] for cell in board.generic_storages}
+        == board.generic_storage_set
+        and all(image[cell] == cell for cell in board.specific_storages)
+    ]
+
+
+class Canonicalizer:
+    """
+    Computes canonical keys for the states of one board.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.symmetries = symmetries(board)
+
+    def key(self, state: State, normalized: bool = False) -> tuple:
+        """
+        Returns the canonical key of a state: the smallest, over the
+        board's symmetries, of the smallest cell of the robot's region
+        followed by the box positions. If the state is already
+        normalized (see pushes.normalize) and the board has no
+        symmetries, no flood fill is needed.
+        """
+        if normalized and not self.symmetries:
+            return (state.robot,) + state.specific_boxes + state.generic_boxes
+        region = pu.reachable(state)
+        robot = region.index(1)
+        best = (robot,) + state.specific_boxes + state.generic_boxes
+        if not self.symmetries:
+            return best
+        cells = [cell for cell in range(robot, len(region)) if region[cell]]
+        for image in self.symmetries:
+            key = (
+                (min(image[cell] for cell in cells),)
+                + tuple(image[box] for box in state.specific_boxes)
+                + tuple(sorted(image[box] for box in state.generic_boxes))
+            )
+            if key < best:
+                best = key
+        return best
+
+
+class CanonicalClosedSet:
+    """
+    Closed set that detects duplicates by canonical key. In the push
+    search spaces every state is compared that way. Over single steps
+    the robot has to be able to walk around its region, so only states
+    right after a push are; any other step is compared exactly, as with
+    a plain set.
+    """
+
+    def __init__(self, board, search_space: str):
+        self.canonicalizer = Canonicalizer(board)
+        self.pushes = search_space != "steps"
+        self.states = set()
+        self.keys = set()
+        # The last state looked up and its key, as each state is looked
+        # up and then added
+        self.last = (None, None)
+
+    def __iter__(self):
+        return iter(self.states)
+
+    def __len__(self):
+        return len(self.states)
+
+    def canonical_key(self, state: State):
+        """
+        Returns the state's canonical key, or None if it is compared
+        exactly.
+        """
+        last_state, last_key = self.last
+        if state is last_state:
+            return last_key
+        parent = state.parent
+        if self.pushes:
+            key = self.canonicalizer.key(state, normalized=True)
+        elif (
+            parent is not None
+            and state.specific_boxes is parent.specific_boxes
+            and state.generic_boxes is parent.generic_boxes
+        ):
+            key = None
+        else:
+            key = self.canonicalizer.key(state)
+        self.last = (state, key)
+        return key
+
+    def add(self, state: State):
+        self.states.add(state)
+        key = self.canonical_key(state)
+        if key is not None:
+            self.keys.add(key)
+
+    def __contains__(self, state: State):
+        if state in self.states:
+            return True
+        key = self.canonical_key(state)
+        return key is not None and key in self.keys
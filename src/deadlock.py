@@ -0,0 +1,165 @@
+"""
+Deadlock detection for freshly pushed boxes, beyond the dead squares
+and stuck() checks: boxes frozen in place by walls and other frozen
+boxes (which includes 2x2 blocks and boxes jammed together in a
+corridor) while one of them is off its storage. Deadlocks found this way
+are learned as patterns, so the same cluster is recognized with a table
+lookup the next time it turns up.
+"""
+
+import movement as mv
+from state import State
+
+# Maximum number of learned patterns kept per board
+MAX_PATTERNS = 1 << 14
+
+
+class DeadlockTable:
+    """
+    Deadlock patterns for one board. The 2x2 windows around every cell
+    are precomputed; frozen clusters are added as they are found. A
+    pattern is a tuple of (cell, box) pairs, box being the specific
+    box's index or -1 for any generic box, and it is indexed under each
+    of its cells.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.windows = [self.windows_around(cell) for cell in range(board.size)]
+        self.patterns = {}
+        self.learned = 0
+
+    def windows_around(self, cell: int):
+        """
+        Returns the other three cells of each 2x2 window holding the
+        cell, leaving out windows that run off the board.
+        """
+        board = self.board
+        if board.walls[cell]:
+            return ()
+        y_position, x_position = board.coords(cell)
+        windows = []
+        for y_step in (-1, 1):
+            for x_step in (-1, 1):
+                y_other, x_other = y_position + y_step, x_position + x_step
+                if 0 <= y_other < board.height and 0 <= x_other < board.width:
+                    windows.append(
+                        (
+                            board.cell(y_other, x_position),
+                            board.cell(y_position, x_other),
+                            board.cell(y_other, x_other),
+                        )
+                    )
+        return tuple(windows)
+
+    def successors(self, successors):
+        """
+        Wraps a successor function to drop children in which the box
+        that was just pushed is part of a deadlock.
+        """
+
+        def live_successors(state: State):
+            for new_state in successors(state):
+                moved = mv.moved_box(state, new_state)
+                if moved is None or not self.is_deadlock(new_state, moved[2]):
+                    yield new_state
+
+        return live_successors
+
+    def is_deadlock(self, state: State, box: int) -> bool:
+        """
+        Checks whether the box on the given cell is part of a deadlock.
+        """
+        for pattern in self.patterns.get(box, ()):
+            if all(box_at(state, cell) == index for cell, index in pattern):
+                return True
+
+        walls = self.board.walls
+        for window in self.windows[box]:
+            boxes = [box]
+            for cell in window:
+                if state.has_box(cell):
+                    boxes.append(cell)
+                elif not walls[cell]:
+                    break
+            else:
+                if not all(self.on_storage(state, cell) for cell in boxes):
+                    return True
+
+        cluster = self.frozen(state, box, set())
+        if cluster is None:
+            return False
+        if all(self.on_storage(state, cell) for cell in cluster):
+            return False
+        self.learn(state, cluster)
+        return True
+
+    def frozen(self, state: State, box: int, stack):
+        """
+        Checks whether the box on the given cell can never move again:
+        it's frozen if it can't be pushed along either axis, because of
+        a wall, dead squares on both sides, or a neighbouring box that
+        is frozen itself. Boxes on the stack (those whose own check led
+        here) count as walls. Returns the set of boxes shown to be
+        frozen, or None if the box isn't.
+        """
+        board = self.board
+        walls = board.walls
+        offsets = board.offsets
+        index = box_at(state, box)
+        dead = board.dead_generic if index == -1 else board.dead_specific[index]
+
+        stack.add(box)
+        cluster = {box}
+        for axis in (0, 1):
+            first = box + offsets[axis]
+            second = box + offsets[axis + 2]
+            if walls[first] or walls[second] or first in stack or second in stack:
+                continue
+            if dead[first] and dead[second]:
+                continue
+            for neighbor in (first, second):
+                if state.has_box(neighbor):
+                    neighbors = self.frozen(state, neighbor, stack)
+                    if neighbors is not None:
+                        cluster.update(neighbors)
+                        break
+            else:
+                stack.discard(box)
+                return None
+        stack.discard(box)
+        return cluster
+
+    def on_storage(self, state: State, cell: int) -> bool:
+        """
+        Checks whether the box on the given cell is on a storage it may
+        finish on.
+        """
+        board = self.board
+        index = box_at(state, cell)
+        if index == -1:
+            return cell in board.generic_storage_set
+        return (
+            index < len(board.specific_storages)
+            and board.specific_storages[index] == cell
+        )
+
+    def learn(self, state: State, cluster):
+        if self.learned >= MAX_PATTERNS:
+            return
+        pattern = tuple((cell, box_at(state, cell)) for cell in sorted(cluster))
+        for cell in cluster:
+            self.patterns.setdefault(cell, []).append(pattern)
+        self.learned += 1
+
+
+def box_at(state: State, cell: int):
+    """
+    Returns the index of the specific box on the given cell, -1 for a
+    generic box, or None if there is no box there.
+    """
+    if cell in state.specific_boxes:
+        return state.specific_boxes.index(cell)
+    if cell in state.generic_boxes:
+        return -1
+    return None
@@ -4,6 +4,7 @@ design pattern to enable runtime polymorphism
 """
 
 import heapq
+import itertools
 import string
 from collections import deque
 
@@ -28,6 +29,13 @@ class Fringe:
     def pop(self) -> State:
         raise NotImplementedError
 
+    def peek(self, count: int):
+        """
+        Returns up to count of the states that will be popped soonest,
+        without removing them (roughly in order, for a priority fringe).
+        """
+        raise NotImplementedError
+
 
 class BFSFringe(Fringe):
     """
@@ -43,6 +51,9 @@ class BFSFringe(Fringe):
     def pop(self) -> State:
         return self.contents.popleft()
 
+    def peek(self, count: int):
+        return list(itertools.islice(self.contents, count))
+
 
 class DFSFringe(Fringe):
     """
@@ -58,6 +69,9 @@ class DFSFringe(Fringe):
     def pop(self) -> State:
         return self.contents.pop()
 
+    def peek(self, count: int):
+        return list(itertools.islice(reversed(self.contents), count))
+
 
 class PriorityFringe(Fringe):
     """
@@ -73,19 +87,107 @@ class PriorityFringe(Fringe):
     def pop(self) -> State:
         return heapq.heappop(self.contents)
 
+    def peek(self, count: int):
+        # The front of the heap holds its smallest entries
+        return self.contents[:count]
+
+
+class BucketFringe(Fringe):
+    """
+    Fringe for GBFS or A* over integer scores: a bucket of states for
+    each heuristic_score and, within it, for each move_count, so adding
+    and popping never compare states. Among equal scores the state with
+    the most moves is popped first (for A*, the one with the smallest
+    heuristic estimate), and among those the one added last.
+    """
+
+    def __init__(self):
+        # buckets[score][moves] is a stack of states
+        self.buckets = []
+        # Number of states under each score, and the highest move_count
+        # there may be a state for
+        self.counts = []
+        self.deepest = []
+        self.size = 0
+        # No bucket below this score holds any state
+        self.lowest = 0
+
+    def __bool__(self):
+        return self.size > 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, node: State):
+        score = node.heuristic_score
+        moves = node.move_count
+        while len(self.buckets) <= score:
+            self.buckets.append([])
+            self.counts.append(0)
+            self.deepest.append(0)
+        level = self.buckets[score]
+        while len(level) <= moves:
+            level.append([])
+        level[moves].append(node)
+        self.counts[score] += 1
+        if moves > self.deepest[score]:
+            self.deepest[score] = moves
+        if score < self.lowest:
+            self.lowest = score
+        self.size += 1
+
+    def pop(self) -> State:
+        score = self.lowest
+        while not self.counts[score]:
+            score += 1
+        self.lowest = score
+        level = self.buckets[score]
+        moves = self.deepest[score]
+        while not level[moves]:
+            moves -= 1
+        self.deepest[score] = moves
+        self.counts[score] -= 1
+        self.size -= 1
+        return level[moves].pop()
+
+    def peek(self, count: int):
+        states = []
+        if count <= 0:
+            return states
+        for score in range(self.lowest, len(self.buckets)):
+            if not self.counts[score]:
+                continue
+            level = self.buckets[score]
+            for moves in range(self.deepest[score], -1, -1):
+                states.extend(reversed(level[moves][-(count - len(states)) :]))
+                if len(states) >= count:
+                    return states
+        return states
+
 
 class FringeFactory:
     """
     Factory to enable runtime polymorphism with respect to Fringe
     """
 
+    # One name for each fringe create_fringe() knows
+    ALGORITHMS = ("BFS", "DFS", "GBFS", "A*")
+
+    # Priority queues GBFS and A* can use: a binary heap, or buckets
+    # indexed by score (integer scores only)
+    QUEUES = ("heap", "buckets")
+
     @staticmethod
-    def create_fringe(algorithm: str = "BFS"):
+    def create_fringe(algorithm: str = "BFS", queue: str = "heap"):
+        if queue not in FringeFactory.QUEUES:
+            raise ValueError(f"Unknown queue: {queue}")
         if algorithm == "BFS":
             return BFSFringe()
         elif algorithm == "DFS":
             return DFSFringe()
         elif algorithm in ("GBFS", "A*", "astar"):
+            if queue == "buckets":
+                return BucketFringe()
             return PriorityFringe()
         else:
             raise ValueError(f"Unknown algorithm: {algorithm}")
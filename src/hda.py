@@ -0,0 +1,438 @@
+"""
+Hash-distributed A* (HDA*). Each of several worker processes owns the
+states whose Zobrist hash is its number modulo the number of workers,
+and keeps their open list and best known move counts. A worker expands
+its own states and sends every child to the child's owner, in batches of
+packed integers rather than pickled States. A goal popped by any worker
+becomes the incumbent solution; the search ends once no worker holds a
+state that could lead to a cheaper one and no batch is still on its way,
+so the solution is as short as plain A* would find.
+"""
+
+import heapq
+import multiprocessing as mp
+import os
+import queue
+import time
+from array import array
+
+import deadlock
+import heuristics as heur
+import pushes as pu
+from cache import state_key
+from movement import step_successors
+from state import State
+
+ALGORITHMS = ("HDA*", "hda*", "hdastar", "HDAStar", "HDA Star", "hda star")
+
+# Successor function for each search space
+SUCCESSORS = {
+    "steps": step_successors,
+    "pushes": pu.push_successors,
+    "macros": pu.macro_push_successors,
+}
+
+# Records a worker gathers for another worker before sending them
+BATCH_RECORDS = 512
+
+# States a worker expands between sending whatever it has gathered
+FLUSH_INTERVAL = 64
+
+# Seconds a worker with nothing to do waits for a batch at a time, and
+# between the coordinator's checks for the end of the search
+IDLE_WAIT = 0.01
+
+# Move count standing for "no solution yet"
+NO_SOLUTION = (1 << 62) - 1
+
+
+class Shared:
+    """
+    Everything the workers and the coordinator share. Each worker only
+    ever writes its own entries of sent, received and idle, so none of
+    them needs a lock; the coordinator's sends are counted in the last
+    entry of sent.
+    """
+
+    def __init__(self, workers: int, key_length: int):
+        self.inboxes = [mp.Queue() for _ in range(workers)]
+        self.results = mp.Queue()
+        self.sent = mp.Array("q", workers + 1, lock=False)
+        self.received = mp.Array("q", workers, lock=False)
+        self.idle = mp.Array("b", workers, lock=False)
+        # States each worker has expanded so far
+        self.expanded = mp.Array("q", workers, lock=False)
+        # Set when the search is called off before it is done
+        self.stop = mp.Event()
+        # Move count and key of the best goal found so far
+        self.incumbent = mp.Value("q", NO_SOLUTION)
+        self.goal = mp.Array("Q", key_length, lock=False)
+
+    def counts(self):
+        return sum(self.sent), sum(self.received)
+
+
+class Worker:
+    """
+    One worker process's part of the search. A record, as sent between
+    workers, is the state's move count, heuristic estimate, last move
+    and Zobrist hash, then its key (see state_key) and its parent's key
+    (all zeros for the root).
+    """
+
+    def __init__(
+        self,
+        number: int,
+        workers: int,
+        board,
+        key_length: int,
+        specific_count: int,
+        search_space: str,
+        heuristic: str,
+        deadlocks: bool,
+        shared: Shared,
+    ):
+        self.number = number
+        self.workers = workers
+        self.board = board
+        self.key_length = key_length
+        self.specific_count = specific_count
+        self.record_length = 4 + 2 * key_length
+        self.shared = shared
+        self.heuristic = heur.HeuristicFactory.create_heuristic(heuristic)
+        self.successors = SUCCESSORS[search_space]
+        if deadlocks:
+            self.successors = deadlock.DeadlockTable(board).successors(
+                self.successors
+            )
+
+        # Best known move count, heuristic estimate, parent key, last
+        # move and Zobrist hash of every state received
+        self.states = {}
+        # Entries (f, -move count, order, key); ties go to more moves
+        self.open = []
+        self.order = 0
+        self.outboxes = [array("Q") for _ in range(workers)]
+        self.expanded = 0
+        self.generated = 0
+
+    def run(self):
+        shared = self.shared
+        inbox = shared.inboxes[self.number]
+        while True:
+            # Take in everything that has arrived
+            while True:
+                try:
+                    message = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if not self.handle(message):
+                    return
+
+            if self.expand_next():
+                if self.expanded % FLUSH_INTERVAL == 0:
+                    self.flush()
+                    shared.expanded[self.number] = self.expanded
+                    if shared.stop.is_set():
+                        return self.report()
+                continue
+
+            # Nothing worth expanding: send what's left, then wait
+            self.flush()
+            shared.expanded[self.number] = self.expanded
+            if shared.stop.is_set():
+                return self.report()
+            shared.idle[self.number] = 1
+            try:
+                message = inbox.get(timeout=IDLE_WAIT)
+            except queue.Empty:
+                continue
+            if not self.handle(message):
+                return
+
+    def handle(self, message) -> bool:
+        """
+        Handles a message from the inbox; returns False on "stop".
+        """
+        kind = message[0]
+        if kind == "records":
+            shared = self.shared
+            shared.idle[self.number] = 0
+            shared.received[self.number] += 1
+            records = array("Q")
+            records.frombytes(message[1])
+            length = self.record_length
+            for start in range(0, len(records), length):
+                self.receive(records[start : start + length])
+        elif kind == "trace":
+            moves, h, parent, move, zobrist = self.states[message[1]]
+            self.shared.results.put(("trace", parent, move))
+        elif kind == "stop":
+            self.report()
+            return False
+        return True
+
+    def report(self):
+        self.shared.results.put(("stats", self.expanded, self.generated))
+
+    def receive(self, record):
+        key_length = self.key_length
+        moves, h, move, zobrist = record[0], record[1], record[2], record[3]
+        key = tuple(record[4 : 4 + key_length])
+        parent = tuple(record[4 + key_length :])
+        known = self.states.get(key)
+        if known is not None and known[0] <= moves:
+            return
+        self.states[key] = (moves, h, parent, move, zobrist)
+        self.order += 1
+        heapq.heappush(self.open, (moves + h, -moves, self.order, key))
+
+    def expand_next(self) -> bool:
+        """
+        Pops and expands the best open state that could still improve
+        on the incumbent; returns False if there is none.
+        """
+        incumbent = self.shared.incumbent.value
+        while self.open:
+            f, negative_moves, _, key = self.open[0]
+            if f >= incumbent:
+                return False
+            heapq.heappop(self.open)
+            moves, h, parent, move, zobrist = self.states[key]
+            # A shorter way here turned up after this entry was queued
+            if moves != -negative_moves:
+                continue
+            break
+        else:
+            return False
+
+        self.shared.idle[self.number] = 0
+        self.expanded += 1
+        state = self.rebuild(key, moves, h, zobrist)
+        if state.is_goal():
+            self.found(key, moves)
+            return True
+
+        for new_state in self.successors(state):
+            self.generated += 1
+            score = self.heuristic.update(state, new_state)
+            if score == -1:
+                continue
+            owner = new_state.zobrist % self.workers
+            record = (
+                (new_state.move_count, score, new_state.last_move, new_state.zobrist)
+                + state_key(new_state)
+                + key
+            )
+            if owner == self.number:
+                self.receive(record)
+            else:
+                outbox = self.outboxes[owner]
+                outbox.extend(record)
+                if len(outbox) >= BATCH_RECORDS * self.record_length:
+                    self.send(owner)
+        return True
+
+    def rebuild(self, key, moves: int, h: int, zobrist: int) -> State:
+        split = 1 + self.specific_count
+        return State(
+            board=self.board,
+            robot=key[0],
+            specific_boxes=key[1:split],
+            generic_boxes=key[split:],
+            move_count=moves,
+            heuristic_estimate=h,
+            zobrist=zobrist,
+        )
+
+    def found(self, key, moves: int):
+        shared = self.shared
+        with shared.incumbent.get_lock():
+            if moves < shared.incumbent.value:
+                shared.goal[:] = list(key)
+                shared.incumbent.value = moves
+
+    def send(self, owner: int):
+        outbox = self.outboxes[owner]
+        # Counted before it goes out, so it is never in flight uncounted
+        self.shared.sent[self.number] += 1
+        self.shared.inboxes[owner].put(("records", outbox.tobytes()))
+        self.outboxes[owner] = array("Q")
+
+    def flush(self):
+        for owner, outbox in enumerate(self.outboxes):
+            if outbox:
+                self.send(owner)
+
+
+def run_worker(*arguments):
+    Worker(*arguments).run()
+
+
+class HDAStar:
+    """
+    HDA* from a start state over the given search space, with the named
+    heuristic, run by the given number of worker processes.
+    """
+
+    def __init__(
+        self,
+        heuristic: str,
+        search_space: str = "steps",
+        workers: int = 0,
+        deadlocks: bool = True,
+    ):
+        self.heuristic = heuristic
+        self.search_space = search_space
+        self.workers = workers or os.cpu_count() or 1
+        self.deadlocks = deadlocks
+        self.iterations = 0
+        self.generated = 0
+
+    def search(self, start_state: State, on_wait=None) -> State:
+        """
+        Returns a goal state whose parent chain is the solution path, or
+        None if there is no solution. The start state must already be
+        normalized for the push search spaces. While the workers search,
+        on_wait(expanded) is called every IDLE_WAIT seconds with the
+        number of states expanded so far; if it returns True, the
+        workers are stopped and None is returned.
+        """
+        board = start_state.board
+        workers = self.workers
+        root_key = state_key(start_state)
+        key_length = len(root_key)
+        shared = Shared(workers, key_length)
+
+        start_score = heur.HeuristicFactory.create_heuristic(self.heuristic)(
+            start_state
+        )
+        if start_score == -1:
+            return None
+
+        processes = [
+            mp.Process(
+                target=run_worker,
+                args=(
+                    number,
+                    workers,
+                    board,
+                    key_length,
+                    len(start_state.specific_boxes),
+                    self.search_space,
+                    self.heuristic,
+                    self.deadlocks,
+                    shared,
+                ),
+                daemon=True,
+            )
+            for number in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        try:
+            root = (
+                array(
+                    "Q",
+                    (start_state.move_count, start_score, 0, start_state.zobrist),
+                )
+                + array("Q", root_key)
+                + array("Q", bytes(8 * key_length))
+            )
+            shared.sent[workers] += 1
+            shared.inboxes[start_state.zobrist % workers].put(
+                ("records", root.tobytes())
+            )
+            stopped = self.wait(shared, processes, on_wait)
+
+            solution = None
+            if not stopped and shared.incumbent.value != NO_SOLUTION:
+                solution = self.trace(
+                    start_state, tuple(shared.goal), shared, processes
+                )
+        finally:
+            shared.stop.set()
+            for inbox in shared.inboxes:
+                inbox.put(("stop",))
+            self.collect(shared, processes)
+        return solution
+
+    def wait(self, shared: Shared, processes, on_wait=None) -> bool:
+        """
+        Waits until every worker is idle with no batch in flight, which
+        must hold through a whole look at the workers, so none can have
+        picked up work in the meantime. Returns True if on_wait called
+        the search off first.
+        """
+        while True:
+            time.sleep(IDLE_WAIT)
+            if on_wait is not None and on_wait(sum(shared.expanded)):
+                return True
+            sent, received = shared.counts()
+            if sent != received or not all(shared.idle):
+                if not all(process.is_alive() for process in processes):
+                    raise RuntimeError("An HDA* worker died")
+                continue
+            if shared.counts() == (sent, received):
+                return False
+
+    def trace(
+        self, start_state: State, goal_key, shared: Shared, processes
+    ) -> State:
+        """
+        Follows the parent keys back from the goal, asking each state's
+        owner, and returns the goal state of the rebuilt path.
+        """
+        board = start_state.board
+        split = 1 + len(start_state.specific_boxes)
+        steps = []
+        key = goal_key
+        while any(key):
+            robot, specific_boxes, generic_boxes = key[0], key[1:split], key[split:]
+            zobrist = board.zobrist(robot, specific_boxes, generic_boxes)
+            owner = zobrist % self.workers
+            shared.inboxes[owner].put(("trace", key))
+            while True:
+                try:
+                    _, parent, move = shared.results.get(timeout=IDLE_WAIT)
+                    break
+                except queue.Empty:
+                    if not processes[owner].is_alive():
+                        raise RuntimeError("An HDA* worker died")
+            steps.append((key, move))
+            key = parent
+
+        state = start_state
+        for key, move in reversed(steps[:-1]):
+            state = State(
+                board=board,
+                robot=key[0],
+                specific_boxes=key[1:split],
+                generic_boxes=key[split:],
+                parent=state,
+                last_move=move,
+                move_count=state.move_count + 1,
+            )
+        return state
+
+    def collect(self, shared: Shared, processes):
+        """
+        Adds up the workers' counts as they stop, and reaps them.
+        """
+        reports = 0
+        while reports < len(processes):
+            try:
+                message = shared.results.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    break
+                continue
+            if message[0] == "stats":
+                self.iterations += message[1]
+                self.generated += message[2]
+                reports += 1
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
@@ -2,48 +2,41 @@
 Contains heuristic functions and related.
 """
 
-import actor as act
-from actor import Actor
+from collections import OrderedDict
+
+import movement as mv
+from board import UNREACHABLE
 from state import State
 
 
-def stuck_memoized(box: Actor, state: State, cache):  # Written by ChatGPT
+def stuck_memoized(box: int, state: State, cache):  # Written by ChatGPT
     """
-    Memoization layer for stuck() in order to store actors that have
+    Memoization layer for stuck() in order to store boxes that have
     already been checked.
     """
-    key = (box.x_position, box.y_position)
-    if key not in cache:
-        cache[key] = False
-        cache[key] = stuck(box, state, cache)
-    return cache[key]
+    if box not in cache:
+        cache[box] = False
+        cache[box] = stuck(box, state, cache)
+    return cache[box]
 
 
-def stuck(box: Actor, state: State, cache):
+def stuck(box: int, state: State, cache):
     """
-    Checks if a box is stuck; returns True if so.
+    Checks if the box at the given cell is stuck; returns True if so.
     """
+    board = state.board
 
-    box_x = box.x_position
-    box_y = box.y_position
-
-    adjacent_spaces = [None] * 4
-
-    adjacent_spaces[0] = state.mapped_actors[box_y - 1][box_x]
-    adjacent_spaces[1] = state.mapped_actors[box_y][box_x + 1]
-    adjacent_spaces[2] = state.mapped_actors[box_y + 1][box_x]
-    adjacent_spaces[3] = state.mapped_actors[box_y][box_x - 1]
+    # Adjacent cells in the order north, east, south, west
+    adjacent_spaces = [box + offset for offset in board.offsets]
 
     # A box is stuck if it is blocked in at least two mutually-adjacent
     # directions by immovable objects (i.e. a wall or another stuck box)
     is_immovable = [False] * 4
 
     for i in range(4):
-        if adjacent_spaces[i] == None:
-            is_immovable[i] = False
-        elif adjacent_spaces[i].symbol == "O":
+        if board.walls[adjacent_spaces[i]]:
             is_immovable[i] = True
-        elif act.is_box(adjacent_spaces[i]) and stuck_memoized(
+        elif state.has_box(adjacent_spaces[i]) and stuck_memoized(
             adjacent_spaces[i], state, cache
         ):
             is_immovable[i] = True
@@ -61,21 +54,46 @@ def stuck(box: Actor, state: State, cache):
     return False
 
 
+def blocked(box: int, dead, state: State):
+    """
+    Checks if a box can no longer reach its storage: either it sits on
+    a dead square (an O(1) lookup into the board's precomputed table),
+    or it is stuck against other boxes. Boxes stuck against walls alone
+    are always on dead squares, so stuck() only runs for boxes that
+    have a neighbouring box.
+    """
+    if dead[box]:
+        return True
+    for offset in state.board.offsets:
+        if state.has_box(box + offset):
+            # Each check gets its own cache: stuck_memoized() caches
+            # boxes that are still being checked as not stuck, so a
+            # shared cache would make the result depend on which box
+            # was checked first.
+            return stuck_memoized(box, state, {})
+    return False
+
+
+def manhattan_distance(board, first: int, second: int) -> int:
+    first_y, first_x = board.coords(first)
+    second_y, second_x = board.coords(second)
+    return abs(first_y - second_y) + abs(first_x - second_x)
+
+
 def manhattan_heuristic(state: State):
     """
     Returns the sum of the manhattan distance of each box to its
     (nearest) corresponding storage.
     """
+    board = state.board
     specific_boxes = state.specific_boxes
-    specific_storages = state.specific_storages
+    specific_storages = board.specific_storages
     generic_boxes = state.generic_boxes
-    generic_storages = state.generic_storages
+    generic_storages = board.generic_storages
 
     total_distances_specific = 0
-    for i in range(len(specific_boxes)):
-        y_distance = abs(specific_boxes[i].y_position - specific_storages[i].y_position)
-        x_distance = abs(specific_boxes[i].x_position - specific_storages[i].x_position)
-        distance = y_distance + x_distance
+    for box, storage in zip(specific_boxes, specific_storages):
+        distance = manhattan_distance(board, box, storage)
         total_distances_specific += distance
     # Generic storages are more complicated since we must find the
     # nearest generic storage for each box.
@@ -83,13 +101,9 @@ def manhattan_heuristic(state: State):
     for i in range(len(generic_boxes)):
         smallest_distance = -1
         for j in range(len(generic_storages)):
-            y_distance = abs(
-                generic_boxes[i].y_position - generic_storages[j].y_position
-            )
-            x_distance = abs(
-                generic_boxes[i].x_position - generic_storages[j].x_position
+            sum_distance = manhattan_distance(
+                board, generic_boxes[i], generic_storages[j]
             )
-            sum_distance = y_distance + x_distance
             if smallest_distance == -1 or sum_distance < smallest_distance:
                 smallest_distance = sum_distance
         if smallest_distance != -1:
@@ -103,22 +117,21 @@ def manhattan_heuristic(state: State):
 def custom_heuristic(state: State):
     """
     The same as the manhattan heuristic, except that if there is at
-    least one stuck box in the state, returns -1.
+    least one stuck box (see blocked()) in the state, returns -1.
     """
+    board = state.board
     specific_boxes = state.specific_boxes
-    specific_storages = state.specific_storages
+    specific_storages = board.specific_storages
     generic_boxes = state.generic_boxes
-    generic_storages = state.generic_storages
-
-    stuck_cache = {}
+    generic_storages = board.generic_storages
 
     total_distances_specific = 0
-    for i in range(len(specific_boxes)):
-        y_distance = abs(specific_boxes[i].y_position - specific_storages[i].y_position)
-        x_distance = abs(specific_boxes[i].x_position - specific_storages[i].x_position)
-        distance = y_distance + x_distance
+    for box, storage, dead in zip(
+        specific_boxes, specific_storages, board.dead_specific
+    ):
+        distance = manhattan_distance(board, box, storage)
         # If the box is not in its storage, check if it's stuck.
-        if distance != 0 and stuck_memoized(specific_boxes[i], state, stuck_cache):
+        if distance != 0 and blocked(box, dead, state):
             return -1
         total_distances_specific += distance
 
@@ -126,19 +139,15 @@ def custom_heuristic(state: State):
     for i in range(len(generic_boxes)):
         smallest_distance = -1
         for j in range(len(generic_storages)):
-            y_distance = abs(
-                generic_boxes[i].y_position - generic_storages[j].y_position
+            sum_distance = manhattan_distance(
+                board, generic_boxes[i], generic_storages[j]
             )
-            x_distance = abs(
-                generic_boxes[i].x_position - generic_storages[j].x_position
-            )
-            sum_distance = y_distance + x_distance
             if smallest_distance == -1 or sum_distance < smallest_distance:
                 smallest_distance = sum_distance
         if smallest_distance != -1:
             # If the box is not in its storage, check if it's stuck.
-            if smallest_distance != 0 and stuck_memoized(
-                generic_boxes[i], state, stuck_cache
+            if smallest_distance != 0 and blocked(
+                generic_boxes[i], board.dead_generic, state
             ):
                 return -1
             total_distances_generic += smallest_distance
@@ -148,25 +157,434 @@ def custom_heuristic(state: State):
     return score
 
 
+def push_distance_heuristic(state: State):
+    """
+    Returns the sum of the push distance of each box to its (nearest)
+    corresponding storage, read from the board's precomputed tables.
+    Unlike the manhattan distance this accounts for walls, and costs
+    one lookup per box. Returns -1 if a box can't reach any storage.
+    """
+    board = state.board
+
+    score = 0
+    for box, distances in zip(state.specific_boxes, board.specific_distances):
+        score += distances[box]
+    nearest_distances = board.nearest_generic_distances
+    for box in state.generic_boxes:
+        score += nearest_distances[box]
+
+    # Any unreachable box pushes the sum past the sentinel
+    if score >= UNREACHABLE:
+        return -1
+
+    return score
+
+
 def null_heuristic(state: State):
     return 0
 
 
+class Heuristic:
+    """
+    Base class that defines the Heuristic interface. Calling a
+    heuristic evaluates a state from scratch; update() evaluates a child
+    from its parent instead, which subclasses override to only account
+    for the box that moved. Both record the heuristic on the state (in
+    heuristic_estimate) for its own children to build on.
+    """
+
+    def __init__(self, function=null_heuristic):
+        # Full (from-scratch) evaluation function
+        self.function = function
+
+    def __call__(self, state: State):
+        score = self.evaluate(state)
+        state.heuristic_estimate = score
+        return score
+
+    def evaluate(self, state: State):
+        """
+        Evaluates the state from scratch without touching it.
+        """
+        return self.function(state)
+
+    def update(self, parent: State, child: State):
+        """
+        Evaluates a child of an already-evaluated parent.
+        """
+        return self(child)
+
+
+class AdditiveHeuristic(Heuristic):
+    """
+    Heuristic that is a sum of independent per-box costs. A child's
+    score is its parent's score minus the moved box's old cost plus its
+    new cost, or the parent's score unchanged if only the robot moved.
+    """
+
+    def box_cost(self, board, index: int, cell: int):
+        """
+        Cost of the box at cell; index is the specific box's index, or
+        -1 for a generic box.
+        """
+        raise NotImplementedError
+
+    def check(self, child: State, score: int, moved):
+        """
+        Final adjustment of an incrementally computed score.
+        """
+        return score
+
+    def update(self, parent: State, child: State):
+        parent_score = parent.heuristic_estimate
+        if parent_score is None or parent_score == -1:
+            return self(child)
+
+        score = parent_score
+        moved = mv.moved_box(parent, child)
+        if moved is not None:
+            index, old_cell, new_cell = moved
+            board = child.board
+            score += self.box_cost(board, index, new_cell)
+            score -= self.box_cost(board, index, old_cell)
+            score = self.check(child, score, moved)
+
+        child.heuristic_estimate = score
+        return score
+
+
+class ManhattanHeuristic(AdditiveHeuristic):
+    """
+    Incremental version of manhattan_heuristic; O(storages) per child.
+    """
+
+    def __init__(self, function=manhattan_heuristic):
+        super().__init__(function)
+
+    def box_cost(self, board, index: int, cell: int):
+        if index != -1:
+            return manhattan_distance(board, cell, board.specific_storages[index])
+        if not board.generic_storages:
+            return 0
+        return min(
+            manhattan_distance(board, cell, storage)
+            for storage in board.generic_storages
+        )
+
+
+class CustomHeuristic(ManhattanHeuristic):
+    """
+    Incremental version of custom_heuristic. Only boxes touching the
+    moved box (directly or through a chain of boxes) can have become
+    stuck, so only that cluster is checked.
+    """
+
+    def __init__(self):
+        super().__init__(custom_heuristic)
+
+    def check(self, child: State, score: int, moved):
+        board = child.board
+        cluster = [moved[2]]
+        seen = {moved[2]}
+        while cluster:
+            box = cluster.pop()
+            if box in child.specific_boxes:
+                index = child.specific_boxes.index(box)
+                dead = board.dead_specific[index]
+            else:
+                index = -1
+                dead = board.dead_generic
+            # If the box is not in its storage, check if it's stuck.
+            if self.box_cost(board, index, box) != 0 and blocked(box, dead, child):
+                return -1
+            for offset in board.offsets:
+                neighbor = box + offset
+                if neighbor not in seen and child.has_box(neighbor):
+                    seen.add(neighbor)
+                    cluster.append(neighbor)
+        return score
+
+
+class PushDistanceHeuristic(AdditiveHeuristic):
+    """
+    Incremental version of push_distance_heuristic; O(1) per child.
+    """
+
+    def __init__(self):
+        super().__init__(push_distance_heuristic)
+
+    def box_cost(self, board, index: int, cell: int):
+        if index != -1:
+            return board.specific_distances[index][cell]
+        return board.nearest_generic_distances[cell]
+
+    def check(self, child: State, score: int, moved):
+        # The parent was reachable, so only the moved box can be past
+        # the sentinel
+        if score >= UNREACHABLE:
+            return -1
+        return score
+
+
+class Assignment:
+    """
+    A minimum-cost assignment of generic boxes (rows) to generic
+    storages (columns), found with the Hungarian algorithm (shortest
+    augmenting paths with potentials). If there are fewer boxes than
+    storages, the matrix is padded with zero-cost dummy rows so that it
+    stays square. Arrays are 1-indexed; column 0 is a virtual column
+    used while augmenting.
+    """
+
+    def __init__(self, rows, row_potentials, column_potentials, matches):
+        # Cell of the box in each row (None for rows[0] and dummy rows)
+        self.rows = rows
+        self.row_potentials = row_potentials
+        self.column_potentials = column_potentials
+        # Row matched to each column (0 if unmatched)
+        self.matches = matches
+
+    @classmethod
+    def solve(cls, board, boxes):
+        """
+        Computes the assignment for the given boxes from scratch.
+        """
+        size = len(board.generic_storages)
+        assignment = cls(
+            (None,) + tuple(boxes) + (None,) * (size - len(boxes)),
+            [0] * (size + 1),
+            [0] * (size + 1),
+            [0] * (size + 1),
+        )
+        for row in range(1, size + 1):
+            assignment.augment(board, row)
+        return assignment
+
+    def moved(self, board, old_box: int, new_box: int):
+        """
+        Returns the assignment after the box at old_box was pushed to
+        new_box. Only that box's row changes, so instead of solving from
+        scratch, the row is unmatched, its potential is lowered to keep
+        every reduced cost non-negative, and a single augmenting path is
+        searched for it: O(storages^2) instead of O(storages^3).
+        """
+        row = self.rows.index(old_box)
+        rows = self.rows[:row] + (new_box,) + self.rows[row + 1 :]
+        matches = list(self.matches)
+        matches[matches.index(row, 1)] = 0
+        column_potentials = list(self.column_potentials)
+        row_potentials = list(self.row_potentials)
+        row_potentials[row] = min(
+            distances[new_box] - column_potentials[column]
+            for column, distances in enumerate(board.generic_distances, start=1)
+        )
+
+        assignment = Assignment(rows, row_potentials, column_potentials, matches)
+        assignment.augment(board, row)
+        return assignment
+
+    def augment(self, board, row: int):
+        """
+        Adds an unmatched row to the matching along a shortest
+        augmenting path, updating the potentials.
+        """
+        distances = board.generic_distances
+        rows = self.rows
+        u = self.row_potentials
+        v = self.column_potentials
+        matches = self.matches
+        columns = len(v)
+
+        matches[0] = row
+        minimum = [float("inf")] * columns
+        used = [False] * columns
+        way = [0] * columns
+        column = 0
+        while True:
+            used[column] = True
+            current_row = matches[column]
+            current_box = rows[current_row]
+            delta = float("inf")
+            next_column = 0
+            for j in range(1, columns):
+                if not used[j]:
+                    if current_box is None:
+                        reduced = -u[current_row] - v[j]
+                    else:
+                        cost = distances[j - 1][current_box]
+                        reduced = cost - u[current_row] - v[j]
+                    if reduced < minimum[j]:
+                        minimum[j] = reduced
+                        way[j] = column
+                    if minimum[j] < delta:
+                        delta = minimum[j]
+                        next_column = j
+            for j in range(columns):
+                if used[j]:
+                    u[matches[j]] += delta
+                    v[j] -= delta
+                else:
+                    minimum[j] -= delta
+            column = next_column
+            if matches[column] == 0:
+                break
+
+        # Flip the matching along the augmenting path
+        while column:
+            previous_column = way[column]
+            matches[column] = matches[previous_column]
+            column = previous_column
+
+    def cost(self, board) -> int:
+        distances = board.generic_distances
+        total = 0
+        for column in range(1, len(self.matches)):
+            box = self.rows[self.matches[column]]
+            if box is not None:
+                total += distances[column - 1][box]
+        return total
+
+
+class MatchingHeuristic(Heuristic):
+    """
+    Push distances like push_distance_heuristic, except that generic
+    boxes are matched to generic storages with a minimum-cost
+    assignment, so no two boxes can claim the same storage. Specific
+    boxes keep their fixed storages.
+
+    Assignments are cached by generic box layout. When updating a child
+    whose parent's assignment is cached, the child's assignment is
+    repaired from the parent's instead of being solved from scratch.
+    """
+
+    CACHE_SIZE = 1 << 16
+
+    def __init__(self):
+        super().__init__()
+        self.assignments = OrderedDict()
+
+    def __call__(self, state: State):
+        score = self.score(state, None)
+        state.heuristic_estimate = score
+        return score
+
+    def evaluate(self, state: State):
+        # Solved from scratch, bypassing the cache, so that it can serve
+        # as a reference for the incremental scores
+        if len(state.generic_boxes) > len(state.board.generic_storages):
+            return -1
+        return self.total(state, Assignment.solve(state.board, state.generic_boxes))
+
+    def update(self, parent: State, child: State):
+        score = self.score(child, parent)
+        child.heuristic_estimate = score
+        return score
+
+    def score(self, state: State, parent: State):
+        if len(state.generic_boxes) > len(state.board.generic_storages):
+            return -1
+        return self.total(state, self.assignment(state, parent))
+
+    def total(self, state: State, assignment: Assignment):
+        board = state.board
+
+        score = assignment.cost(board)
+        for box, distances in zip(state.specific_boxes, board.specific_distances):
+            score += distances[box]
+
+        # Any unreachable box pushes the sum past the sentinel
+        if score >= UNREACHABLE:
+            return -1
+
+        return score
+
+    def assignment(self, state: State, parent: State) -> Assignment:
+        """
+        Returns the assignment for the state's generic boxes, reusing the
+        parent's assignment when possible.
+        """
+        board = state.board
+        generic_boxes = state.generic_boxes
+        assignments = self.assignments
+
+        assignment = assignments.get(generic_boxes)
+        if assignment is not None:
+            assignments.move_to_end(generic_boxes)
+            return assignment
+
+        parent_assignment = None
+        if parent is not None:
+            parent_assignment = assignments.get(parent.generic_boxes)
+
+        if parent_assignment is not None:
+            _, old_box, new_box = mv.moved_box(parent, state)
+            assignment = parent_assignment.moved(board, old_box, new_box)
+        else:
+            assignment = Assignment.solve(board, generic_boxes)
+
+        assignments[generic_boxes] = assignment
+        if len(assignments) > self.CACHE_SIZE:
+            assignments.popitem(last=False)
+        return assignment
+
+
+class VerifiedHeuristic(Heuristic):
+    """
+    Debugging wrapper that checks every incremental score against a
+    full recompute, raising RuntimeError on a mismatch.
+    """
+
+    def __init__(self, heuristic: Heuristic):
+        super().__init__()
+        self.heuristic = heuristic
+
+    def __call__(self, state: State):
+        return self.heuristic(state)
+
+    def evaluate(self, state: State):
+        return self.heuristic.evaluate(state)
+
+    def update(self, parent: State, child: State):
+        score = self.heuristic.update(parent, child)
+        expected = self.heuristic.evaluate(child)
+        if score != expected:
+            raise RuntimeError(
+                f"Incremental heuristic score {score} does not match the "
+                f"full recompute {expected} for state:\n{child}"
+            )
+        return score
+
+
 class HeuristicFactory:
     """
     Factory to enable runtime polymorphism with respect to Heuristic
     """
 
+    # One name for each heuristic create_heuristic() knows (besides none)
+    HEURISTICS = ("manhattan", "custom", "distance", "matching")
+
     @staticmethod
-    def create_heuristic(heuristic: str = None):
+    def create_heuristic(heuristic: str = None, verify: bool = False):
+        """
+        Returns a Heuristic; with verify, every incremental score is
+        checked against a full recompute.
+        """
         if heuristic is not None:
             heuristic = heuristic.strip().lower()
 
-        if heuristic in ("manhattan", "Manhattan", "man", "trivial"):
-            return manhattan_heuristic
-        if heuristic in ("custom"):
-            return custom_heuristic
-        elif heuristic == None or heuristic == "None":
-            return null_heuristic
+        if heuristic == None or heuristic == "none":
+            instance = Heuristic(null_heuristic)
+        elif heuristic in ("manhattan", "Manhattan", "man", "trivial"):
+            instance = ManhattanHeuristic()
+        elif heuristic in ("custom",):
+            instance = CustomHeuristic()
+        elif heuristic in ("distance", "push", "push_distance"):
+            instance = PushDistanceHeuristic()
+        elif heuristic in ("matching", "hungarian", "assignment"):
+            instance = MatchingHeuristic()
         else:
             raise ValueError(f"Unknown heuristic: {heuristic}")
+
+        if verify:
+            return VerifiedHeuristic(instance)
+        return instance
@@ -0,0 +1,108 @@
+"""
+Compact search history. Instead of every state holding on to its
+parent, each state queued by the search records its parent's index and
+the move that led to it in two flat arrays, so a state can be freed as
+soon as it has been expanded. The solution is rebuilt at the end by
+replaying its moves from the root state.
+"""
+
+from array import array
+
+import movement as mv
+from state import State
+from visited import KeyPacker
+
+
+def encode_move(parent: State, child: State) -> int:
+    """
+    Encodes the move from a parent to a child as one integer: the
+    direction for a step that pushes nothing, or the pushed box's cell
+    times four plus the direction for a push (a box is never on cell 0,
+    which is always a wall, so the two never collide).
+    """
+    moved = mv.moved_box(parent, child)
+    if moved is None:
+        return child.last_move
+    return moved[1] * 4 + child.last_move
+
+
+class SearchHistory:
+    """
+    Append-only record of how each queued state was reached. Index 0 is
+    the root state.
+    """
+
+    def __init__(self):
+        self.parents = array("i", [-1])
+        self.moves = array("I", [0])
+
+    def __len__(self):
+        return len(self.parents)
+
+    def add(self, parent: State, child: State) -> int:
+        """
+        Records a child of an already recorded parent and returns the
+        child's index.
+        """
+        self.parents.append(parent.index)
+        self.moves.append(encode_move(parent, child))
+        return len(self.parents) - 1
+
+    def moves_to(self, index: int):
+        """
+        Returns the encoded moves leading from the root to the state
+        with the given index.
+        """
+        moves = []
+        while index > 0:
+            moves.append(self.moves[index])
+            index = self.parents[index]
+        moves.reverse()
+        return moves
+
+
+def replay_moves(root_state: State, moves, successors):
+    """
+    Rebuilds the path of states (with parent links) obtained by applying
+    encoded moves to the root state, using the same successor function
+    as the search.
+    """
+    path = [root_state]
+    for move in moves:
+        state = path[-1]
+        for new_state in successors(state):
+            if encode_move(state, new_state) == move:
+                path.append(new_state)
+                break
+        else:
+            raise RuntimeError(f"Move {move} can't be replayed from state:\n{state}")
+    return path
+
+
+class ZobristSet:
+    """
+    Closed set keyed by the states' Zobrist hashes, each mapped to the
+    state's packed key (see visited.KeyPacker), which confirms equality,
+    so the states themselves can be freed. A state whose hash collides
+    with a different state's keeps its packed key in an overflow set.
+    """
+
+    def __init__(self, packer: KeyPacker):
+        self.packer = packer
+        self.keys = {}
+        self.collisions = set()
+
+    def __len__(self):
+        return len(self.keys) + len(self.collisions)
+
+    def add(self, state: State):
+        key = self.packer.key(state)
+        if self.keys.setdefault(state.zobrist, key) != key:
+            self.collisions.add(key)
+
+    def __contains__(self, state: State):
+        stored = self.keys.get(state.zobrist)
+        if stored is None:
+            return False
+        key = self.packer.key(state)
+        return stored == key or key in self.collisions
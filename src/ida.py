@@ -0,0 +1,134 @@
+"""
+Iterative deepening A* (IDA*). Runs repeated depth-first searches
+bounded by f = g + h, so memory grows with the depth of the solution
+instead of with the number of explored states.
+"""
+
+from state import State
+from visited import create_packer
+
+ALGORITHMS = ("IDA*", "ida*", "idastar", "IDAStar", "IDA Star", "ida star")
+
+# Default maximum number of entries in the transposition table
+TABLE_SIZE = 1 << 18
+
+
+class IDAStar:
+    """
+    IDA* search from a start state. The heuristic is a Heuristic from
+    HeuristicFactory and successors generates the children of a state
+    (single steps or whole pushes).
+
+    A bounded transposition table, keyed by the states' packed positions
+    (see visited.KeyPacker), remembers the lowest move count each state
+    was reached with during the current iteration, so a state reached
+    again along another path is only expanded again if that path is
+    shorter. Packed keys are exact, so two states whose Zobrist hashes
+    collide are never mistaken for each other.
+    """
+
+    def __init__(self, heuristic, successors, table_size: int = TABLE_SIZE):
+        self.heuristic = heuristic
+        self.successors = successors
+        self.table_size = table_size
+        self.table = {}
+        self.packer = None
+        # Number of states expanded and generated so far, over all
+        # iterations
+        self.iterations = 0
+        self.generated = 0
+
+    def search(self, start_state: State, on_expand=None) -> State:
+        """
+        Returns a goal state (its parent chain is the solution path), or
+        None if there is no solution. on_expand(state, path) is called
+        for every expanded state, path being the current search path; if
+        it returns True, the search is abandoned.
+        """
+        if start_state.is_goal():
+            return start_state
+        self.packer = create_packer(start_state)
+        start_score = self.heuristic(start_state)
+        if start_score == -1:
+            return None
+        start_state.heuristic_score = start_score + start_state.move_count
+        bound = start_state.heuristic_score
+
+        while True:
+            self.table.clear()
+            solution, next_bound = self.bounded_search(start_state, bound, on_expand)
+            if solution is not None:
+                return solution
+            # Nothing was cut off by the bound, so everything has been seen
+            if next_bound is None:
+                return None
+            bound = next_bound
+
+    def bounded_search(self, start_state: State, bound: int, on_expand):
+        """
+        Depth-first search of every state with f <= bound. Returns the
+        goal state (or None) and the smallest f that exceeded the bound.
+        """
+        next_bound = None
+        table = self.table
+        pack = self.packer.key
+        # The path from the start to the current state, with an iterator
+        # over the remaining children of each state on it
+        path = [start_state]
+        path_keys = [pack(start_state)]
+        on_path = set(path_keys)
+        stack = [iter(self.children(start_state))]
+
+        while stack:
+            new_state = next(stack[-1], None)
+            if new_state is None:
+                stack.pop()
+                path.pop()
+                on_path.discard(path_keys.pop())
+                continue
+
+            score = new_state.heuristic_estimate + new_state.move_count
+            if score > bound:
+                if next_bound is None or score < next_bound:
+                    next_bound = score
+                continue
+
+            key = pack(new_state)
+            if key in on_path:
+                continue
+            move_count = new_state.move_count
+            best_move_count = table.get(key)
+            if best_move_count is not None and best_move_count <= move_count:
+                continue
+            if best_move_count is None and len(table) >= self.table_size:
+                # Evict the oldest entry to stay within the size bound
+                del table[next(iter(table))]
+            table[key] = move_count
+
+            if new_state.is_goal():
+                return new_state, next_bound
+
+            self.iterations += 1
+            path.append(new_state)
+            path_keys.append(key)
+            on_path.add(key)
+            if on_expand is not None and on_expand(new_state, path):
+                return None, None
+            stack.append(iter(self.children(new_state)))
+
+        return None, next_bound
+
+    def children(self, state: State):
+        """
+        Scores the children of a state, drops those with a stuck box and
+        returns the rest, most promising first.
+        """
+        children = []
+        for new_state in self.successors(state):
+            self.generated += 1
+            score = self.heuristic.update(state, new_state)
+            if score != -1:
+                new_state.heuristic_score = score + new_state.move_count
+                children.append(new_state)
+        children.sort()
+        return children
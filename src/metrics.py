@@ -0,0 +1,223 @@
+"""
+Search instrumentation: counters and timers collected from inside the
+search loop, sampled into a time series that can be exported as JSON or
+CSV. Nothing here is used unless a Metrics is passed to search(), so a
+search without one runs the exact same code as before.
+"""
+
+import csv
+import json
+import time
+
+from heuristics import Heuristic
+from state import State
+
+# Columns of the time series, in CSV order
+FIELDS = (
+    "time",
+    "expanded",
+    "generated",
+    "duplicates",
+    "dead_prunes",
+    "fringe",
+    "fringe_peak",
+    "successor_time",
+    "heuristic_time",
+    "closed_set_time",
+)
+
+
+class Metrics:
+    """
+    Collects counters and timers for one search and samples them every
+    interval seconds. The search wires it in with successors(),
+    heuristic(), closed_set() and observe().
+    """
+
+    def __init__(self, interval: float = 0.1):
+        # Seconds between samples of the time series
+        self.interval = interval
+        self.start_time = None
+        self.next_sample = None
+        self.series = []
+
+        self.expanded = 0
+        # Successors generated, duplicates included
+        self.generated = 0
+        # Successors already in the closed set
+        self.duplicates = 0
+        # Successors discarded as deadlocked: pushes onto dead squares
+        # (which movement.move_actor and the numpy engine refuse and
+        # report through Board.on_dead_push), successors pruned by
+        # deadlock.py or the cache's dead configurations, and states the
+        # heuristic found a stuck box in
+        self.dead_prunes = 0
+        self.dead_pushes = 0
+        self.candidates = 0
+        self.heuristic_prunes = 0
+        self.fringe = 0
+        self.fringe_peak = 0
+
+        # Seconds spent generating successors, evaluating the heuristic
+        # and looking states up in the closed set
+        self.successor_time = 0.0
+        self.heuristic_time = 0.0
+        self.closed_set_time = 0.0
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.next_sample = self.start_time
+
+    def successors(self, successors):
+        """
+        Wraps a successor function to count and time it.
+        """
+
+        def timed_successors(state: State):
+            iterator = successors(state)
+            while True:
+                start = time.perf_counter()
+                new_state = next(iterator, None)
+                self.successor_time += time.perf_counter() - start
+                if new_state is None:
+                    return
+                self.generated += 1
+                yield new_state
+
+        return timed_successors
+
+    def dead_push(self, count: int):
+        """
+        Counts pushes refused for putting a box on a dead square (the
+        board's on_dead_push hook while this Metrics is collecting).
+        """
+        self.dead_pushes += count
+
+    def unpruned(self, successors):
+        """
+        Wraps the bare successor function, before any pruning wrappers,
+        to count the successors they get to see.
+        """
+
+        def counted_successors(state: State):
+            for new_state in successors(state):
+                self.candidates += 1
+                yield new_state
+
+        return counted_successors
+
+    def heuristic(self, heuristic: Heuristic):
+        """
+        Wraps a heuristic to count and time it.
+        """
+        return TimedHeuristic(heuristic, self)
+
+    def closed_set(self, closed_set=None):
+        """
+        Wraps a closed set (by default a new, empty set) to count and
+        time lookups.
+        """
+        return TimedSet(self, set() if closed_set is None else closed_set)
+
+    def observe(self, fringe, iterations: int):
+        """
+        Called for every expanded state; samples the time series when
+        it's due.
+        """
+        self.expanded = iterations
+        self.fringe = len(fringe)
+        if self.fringe > self.fringe_peak:
+            self.fringe_peak = self.fringe
+        if time.perf_counter() >= self.next_sample:
+            self.sample()
+            self.next_sample += self.interval
+
+    def sample(self):
+        """
+        Appends the current value of every field to the time series and
+        returns it as a dict.
+        """
+        # Successors pruned after the unpruned() count are the ones
+        # missing from the generated count
+        pruned = self.candidates - self.generated if self.candidates else 0
+        self.dead_prunes = self.heuristic_prunes + self.dead_pushes + pruned
+        row = {"time": round(time.perf_counter() - self.start_time, 6)}
+        for field in FIELDS[1:]:
+            row[field] = getattr(self, field)
+        self.series.append(row)
+        return row
+
+    def write(self, path: str):
+        """
+        Writes the time series to path, as CSV if it ends in .csv and as
+        JSON (with a summary of the final values) otherwise.
+        """
+        with open(path, "w", newline="") as file:
+            if path.endswith(".csv"):
+                writer = csv.DictWriter(file, fieldnames=FIELDS)
+                writer.writeheader()
+                writer.writerows(self.series)
+            else:
+                summary = self.series[-1] if self.series else None
+                json.dump(
+                    {"summary": summary, "series": self.series},
+                    file,
+                    indent=2,
+                )
+
+
+class TimedHeuristic(Heuristic):
+    """
+    Wrapper that times a heuristic and counts the states it finds a
+    stuck box in.
+    """
+
+    def __init__(self, heuristic: Heuristic, metrics: Metrics):
+        super().__init__()
+        self.heuristic = heuristic
+        self.metrics = metrics
+
+    def timed(self, function, *args):
+        start = time.perf_counter()
+        score = function(*args)
+        self.metrics.heuristic_time += time.perf_counter() - start
+        if score == -1:
+            self.metrics.heuristic_prunes += 1
+        return score
+
+    def __call__(self, state: State):
+        return self.timed(self.heuristic, state)
+
+    def evaluate(self, state: State):
+        return self.heuristic.evaluate(state)
+
+    def update(self, parent: State, child: State):
+        return self.timed(self.heuristic.update, parent, child)
+
+
+class TimedSet:
+    """
+    Wrapper around a closed set that times membership tests and counts
+    the hits.
+    """
+
+    def __init__(self, metrics: Metrics, closed_set):
+        self.metrics = metrics
+        self.closed_set = closed_set
+
+    def __iter__(self):
+        return iter(self.closed_set)
+
+    def __len__(self):
+        return len(self.closed_set)
+
+    def add(self, state):
+        self.closed_set.add(state)
+
+    def __contains__(self, state):
+        start = time.perf_counter()
+        found = state in self.closed_set
+        self.metrics.closed_set_time += time.perf_counter() - start
+        if found:
+            self.metrics.duplicates += 1
+        return found
@@ -0,0 +1,145 @@
+"""
+Contains the movement rules: how the robot walks and pushes boxes.
+"""
+
+from state import State
+
+# Letter for each direction in the standard LURD move notation
+LURD = "urdl"
+
+
+def shift_state(state: State, direction: int) -> State:
+    """
+    Given a state and movement direction, returns the state that
+    results from moving the robot in that direction. If the move is
+    impossible, return None.
+    """
+
+    # The child starts out sharing the parent's (immutable) positions;
+    # move_actor replaces whichever of them change.
+    new_state = State(
+        board=state.board,
+        robot=state.robot,
+        specific_boxes=state.specific_boxes,
+        generic_boxes=state.generic_boxes,
+        parent=state,
+        last_move=direction,
+        move_count=state.move_count,
+        zobrist=state.zobrist,
+    )
+
+    if move_actor(new_state, state.robot, direction):
+        return new_state
+
+    return None
+
+
+def move_actor(state: State, position: int, direction: int) -> bool:
+    """
+    Modifies a state by moving an object in the supplied direction from
+    its initial cell; contains the actual movement logic, and mutates
+    the state supplied in the parameters.
+    """
+    board = state.board
+    destination = position + board.offsets[direction]
+
+    # Check for being blocked by a wall
+    if board.walls[destination]:
+        return False
+
+    if position == state.robot:
+        # Handle the case where the robot is attempting to push a box
+        if state.has_box(destination):
+            # Recursive call in order to try to move the box itself; if
+            # the box fails to move, so does the robot
+            if not move_actor(state, destination, direction):
+                return False
+        keys = board.robot_keys
+        state.zobrist ^= keys[position] ^ keys[destination]
+        state.robot = destination
+        state.move_count += 1
+        return True
+
+    # Otherwise a box is being pushed; boxes cannot push other boxes
+    if state.has_box(destination):
+        return False
+
+    if position in state.specific_boxes:
+        index = state.specific_boxes.index(position)
+        # Prune pushes onto dead squares (see Board.dead_squares)
+        if board.dead_specific[index][destination]:
+            if board.on_dead_push is not None:
+                board.on_dead_push(1)
+            return False
+        boxes = list(state.specific_boxes)
+        boxes[index] = destination
+        state.specific_boxes = tuple(boxes)
+        keys = board.specific_keys[index]
+    else:
+        if board.dead_generic[destination]:
+            if board.on_dead_push is not None:
+                board.on_dead_push(1)
+            return False
+        boxes = list(state.generic_boxes)
+        boxes.remove(position)
+        boxes.append(destination)
+        state.generic_boxes = tuple(sorted(boxes))
+        keys = board.generic_keys
+    state.zobrist ^= keys[position] ^ keys[destination]
+
+    return True
+
+
+def step_successors(state: State):
+    """
+    Generates every state reachable from the supplied one with a single
+    robot step.
+    """
+    for i in range(4):
+        new_state = shift_state(state, i)
+        if new_state is not None:
+            yield new_state
+
+
+def replay(start_state: State, moves):
+    """
+    Returns the path of states obtained by applying a sequence of robot
+    moves (directions) to the start state.
+    """
+    path = [start_state]
+    for move in moves:
+        path.append(shift_state(path[-1], move))
+    return path
+
+
+def moved_box(parent: State, child: State):
+    """
+    Returns (index, old cell, new cell) for the box that moved between a
+    parent and a child state, where index is the specific box's index or
+    -1 for a generic box. Returns None if only the robot moved.
+    """
+    if child.specific_boxes != parent.specific_boxes:
+        for index, (old_cell, new_cell) in enumerate(
+            zip(parent.specific_boxes, child.specific_boxes)
+        ):
+            if old_cell != new_cell:
+                return index, old_cell, new_cell
+    if child.generic_boxes != parent.generic_boxes:
+        (old_cell,) = set(parent.generic_boxes) - set(child.generic_boxes)
+        (new_cell,) = set(child.generic_boxes) - set(parent.generic_boxes)
+        return -1, old_cell, new_cell
+    return None
+
+
+def lurd(path) -> str:
+    """
+    Returns the moves along a path of single-step states in LURD
+    notation: lowercase letters for walking, uppercase for pushes.
+    """
+    moves = []
+    for parent, child in zip(path, path[1:]):
+        letter = LURD[child.last_move]
+        if moved_box(parent, child) is not None:
+            letter = letter.upper()
+        moves.append(letter)
+    return "".join(moves)
@@ -0,0 +1,217 @@
+"""
+Alternative move generation engine built on NumPy. The board is held as
+arrays (a wall mask and a dead square mask per box), and the four robot
+moves of a whole batch of states are generated and validated with array
+operations at once; only building the resulting State objects is left
+to Python. Produces exactly the same successors, in the same order, as
+movement.step_successors.
+
+NumPy is optional: without it, only selecting this engine fails.
+"""
+
+import movement as mv
+from state import State
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+ENGINES = ("python", "numpy")
+
+# Default number of states expanded together
+BATCH_SIZE = 256
+
+# Fewer states than this are expanded by movement.step_successors, as
+# NumPy's overhead per call outweighs the work saved
+MIN_BATCH = 16
+
+# Number of states whose successors may be held, expanded ahead of time
+PENDING_LIMIT = 4 * BATCH_SIZE
+
+# Most states expanded one at a time between looks ahead in the fringe
+MAX_BACKOFF = 63
+
+
+class NumpyEngine:
+    """
+    Step successor generation for one board. Calling the engine with a
+    state returns its successors, like movement.step_successors; with a
+    fringe attached, the states next in line are expanded in the same
+    batch and their successors kept until they are asked for.
+    """
+
+    def __init__(self, board, batch_size: int = BATCH_SIZE):
+        if np is None:
+            raise ImportError("The numpy engine needs NumPy to be installed")
+        self.board = board
+        self.batch_size = batch_size
+        self.fringe = None
+        # Successors of states expanded ahead of time, by id(), along
+        # with the states themselves
+        self.pending = {}
+        # Number of states to expand one at a time before looking ahead
+        # in the fringe again, and how many it was last time
+        self.skip = 0
+        self.backoff = 0
+
+        self.walls = np.array(board.walls, dtype=np.uint8).astype(bool)
+        self.offsets = np.array(board.offsets, dtype=np.int64)
+        # One row of dead squares per specific box, then one for the
+        # generic boxes, so a box's row is its index in
+        # specific_boxes + generic_boxes, capped at the generic row
+        self.dead = np.array(
+            [list(dead) for dead in board.dead_specific] + [list(board.dead_generic)],
+            dtype=np.uint8,
+        ).astype(bool)
+        self.generic_row = len(board.dead_specific)
+        # Zobrist keys, with the box keys in rows laid out the same way
+        self.robot_keys = np.array(board.robot_keys, dtype=np.uint64)
+        self.box_keys = np.array(
+            list(board.specific_keys) + [board.generic_keys], dtype=np.uint64
+        )
+
+    def attach(self, fringe):
+        """
+        Lets the engine look ahead in the fringe (see Fringe.peek) to
+        batch up expansions.
+        """
+        self.fringe = fringe
+
+    def __call__(self, state: State):
+        pending = self.pending.pop(id(state), None)
+        if pending is not None and pending[0] is state:
+            self.report_dead(pending[2])
+            return iter(pending[1])
+        if self.fringe is None or self.skip:
+            self.skip = max(self.skip - 1, 0)
+            return mv.step_successors(state)
+
+        # The states next in line that haven't been expanded yet
+        batch = [state]
+        for other in self.fringe.peek(self.batch_size):
+            if other is not state and id(other) not in self.pending:
+                batch.append(other)
+        if len(batch) < MIN_BATCH:
+            # Look again later, and later still each time in a row
+            # there's nothing worth batching
+            self.backoff = min(2 * self.backoff + 1, MAX_BACKOFF)
+            self.skip = self.backoff
+            return mv.step_successors(state)
+        self.backoff = 0
+
+        if len(self.pending) > PENDING_LIMIT:
+            # The fringe has moved on from most of these
+            self.pending.clear()
+        expanded, dead_counts = self.expand(batch)
+        for other, successors, dead_count in zip(
+            batch[1:], expanded[1:], dead_counts[1:]
+        ):
+            self.pending[id(other)] = (other, successors, dead_count)
+        self.report_dead(dead_counts[0])
+        return iter(expanded[0])
+
+    def report_dead(self, dead_count: int):
+        """
+        Passes a state's pushes onto dead squares on to the board's
+        on_dead_push hook, if it has one, once the state is expanded.
+        """
+        if dead_count and self.board.on_dead_push is not None:
+            self.board.on_dead_push(dead_count)
+
+    def expand(self, states):
+        """
+        Returns the list of successors of each of the states, and the
+        number of pushes onto dead squares left out of each.
+        """
+        board = self.board
+        size = board.size
+        count = len(states)
+        specific_count = len(states[0].specific_boxes)
+
+        robots = np.fromiter((state.robot for state in states), np.int64, count)
+        boxes = np.array(
+            [state.specific_boxes + state.generic_boxes for state in states],
+            dtype=np.int64,
+        ).reshape(count, -1)
+
+        # Cell each move goes to and the cell beyond it, per state and
+        # direction
+        destinations = robots[:, None] + self.offsets[None, :]
+        beyond = np.clip(destinations + self.offsets[None, :], 0, size - 1)
+
+        into_wall = self.walls[destinations]
+        if boxes.shape[1]:
+            hits = boxes[:, None, :] == destinations[:, :, None]
+            pushes = hits.any(axis=2)
+            pushed = hits.argmax(axis=2)
+        else:
+            pushes = np.zeros(destinations.shape, dtype=bool)
+            pushed = np.zeros(destinations.shape, dtype=np.int64)
+        # A box can't be pushed into a wall or another box, nor onto a
+        # dead square for that box
+        rows = np.where(pushed < specific_count, pushed, self.generic_row)
+        jammed = self.walls[beyond] | (
+            boxes[:, None, :] == beyond[:, :, None]
+        ).any(axis=2)
+        dead = pushes & ~into_wall & ~jammed & self.dead[rows, beyond]
+        valid = ~into_wall & ~(pushes & jammed) & ~dead
+        dead_counts = dead.sum(axis=1).tolist()
+
+        # Every child's Zobrist hash, updated as in move_actor
+        zobrists = np.fromiter((state.zobrist for state in states), np.uint64, count)
+        zobrists = (
+            zobrists[:, None]
+            ^ self.robot_keys[robots][:, None]
+            ^ self.robot_keys[destinations]
+        )
+        zobrists ^= np.where(
+            pushes,
+            self.box_keys[rows, destinations] ^ self.box_keys[rows, beyond],
+            np.uint64(0),
+        )
+
+        # Only building the State objects is left to Python, over plain
+        # lists, which index much faster than arrays one item at a time
+        parents, directions = np.nonzero(valid)
+        destinations = destinations[parents, directions].tolist()
+        beyond = beyond[parents, directions].tolist()
+        pushed = np.where(
+            pushes[parents, directions], pushed[parents, directions], -1
+        ).tolist()
+        zobrists = zobrists[parents, directions].tolist()
+        results = [[] for _ in states]
+        for i, direction, destination, target, index, zobrist in zip(
+            parents.tolist(),
+            directions.tolist(),
+            destinations,
+            beyond,
+            pushed,
+            zobrists,
+        ):
+            state = states[i]
+            specific_boxes = state.specific_boxes
+            generic_boxes = state.generic_boxes
+            if index != -1:
+                if index < specific_count:
+                    boxes_list = list(specific_boxes)
+                    boxes_list[index] = target
+                    specific_boxes = tuple(boxes_list)
+                else:
+                    boxes_list = list(generic_boxes)
+                    boxes_list.remove(destination)
+                    boxes_list.append(target)
+                    generic_boxes = tuple(sorted(boxes_list))
+            results[i].append(
+                State(
+                    board=board,
+                    robot=destination,
+                    specific_boxes=specific_boxes,
+                    generic_boxes=generic_boxes,
+                    parent=state,
+                    last_move=direction,
+                    move_count=state.move_count + 1,
+                    zobrist=zobrist,
+                )
+            )
+        return results, dead_counts
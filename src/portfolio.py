@@ -0,0 +1,129 @@
+"""
+Portfolio solving: runs several search configurations on the same
+puzzle at once, each in its own process, and keeps the first solution
+found. Which configuration does best varies a lot between puzzles, so
+this trades idle cores for not having to guess.
+"""
+
+import multiprocessing as mp
+import queue
+import time
+
+from puzzle import initialize_puzzle
+from search import search
+
+# (algorithm, heuristic, search space) for each worker
+CONFIGURATIONS = (
+    ("A*", "custom", "steps"),
+    ("GBFS", "manhattan", "steps"),
+    ("A*", "matching", "pushes"),
+    ("GBFS", "matching", "pushes"),
+    ("IDA*", "matching", "pushes"),
+)
+
+# Workers check whether they've been cancelled every this many states
+STOP_CHECK_INTERVAL = 256
+
+
+class WorkerReport:
+    """
+    What a worker sends back when it finishes or is cancelled.
+    """
+
+    def __init__(self, configuration, moves, iterations, runtime, cancelled):
+        # (algorithm, heuristic, search space)
+        self.configuration = configuration
+        # The solution as a list of directions, or None if not solved
+        self.moves = moves
+        # Number of states examined
+        self.iterations = iterations
+        # Wall time in seconds
+        self.runtime = runtime
+        self.cancelled = cancelled
+
+    def __str__(self):
+        algorithm, heuristic, search_space = self.configuration
+        if self.moves is not None:
+            status = f"solved in {len(self.moves)} moves"
+        elif self.cancelled:
+            status = "cancelled"
+        else:
+            status = "no solution"
+        return (
+            f"{algorithm} + {heuristic} ({search_space}): {status}, "
+            f"{self.iterations} states examined, {self.runtime:.4f} seconds"
+        )
+
+
+def run_worker(puzzle: str, configuration, stop, results):
+    """
+    Worker process: solves the puzzle with one configuration and puts a
+    WorkerReport on the results queue. Gives up once stop is set.
+    """
+    start_time = time.time()
+    algorithm, heuristic, search_space = configuration
+    cancelled = False
+
+    def on_expand(current_state, fringe, iterations):
+        nonlocal cancelled
+        if iterations % STOP_CHECK_INTERVAL == 0 and stop.is_set():
+            cancelled = True
+        return cancelled
+
+    start_state = initialize_puzzle(puzzle)
+    path, stats = search(start_state, algorithm, heuristic, search_space, on_expand)
+
+    moves = None
+    if path is not None:
+        moves = [state.last_move for state in path[1:]]
+    results.put(
+        WorkerReport(
+            configuration, moves, stats.expanded, time.time() - start_time, cancelled
+        )
+    )
+
+
+def solve_portfolio(puzzle: str, configurations=CONFIGURATIONS, timeout=None):
+    """
+    Runs one worker per configuration and waits for the first solution,
+    then cancels the others. Returns the winning WorkerReport (None if
+    nobody solved the puzzle) and the reports of all workers.
+    """
+    stop = mp.Event()
+    results = mp.Queue()
+    workers = [
+        mp.Process(
+            target=run_worker,
+            args=(puzzle, configuration, stop, results),
+            daemon=True,
+        )
+        for configuration in configurations
+    ]
+    for worker in workers:
+        worker.start()
+
+    deadline = None if timeout is None else time.time() + timeout
+    winner = None
+    reports = []
+    while len(reports) < len(workers):
+        if deadline is not None and time.time() >= deadline:
+            stop.set()
+            deadline = None
+        try:
+            report = results.get(timeout=0.1)
+        except queue.Empty:
+            # Don't wait forever on workers that died without reporting
+            if not any(worker.is_alive() for worker in workers) and results.empty():
+                break
+            continue
+        reports.append(report)
+        if winner is None and report.moves is not None:
+            winner = report
+            stop.set()
+
+    for worker in workers:
+        worker.join(timeout=1)
+        if worker.is_alive():
+            worker.terminate()
+
+    return winner, reports
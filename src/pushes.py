@@ -0,0 +1,210 @@
+"""
+Push-level (macro-move) search. Instead of single robot steps, a node
+is a box layout plus the region the robot can reach, and successors
+are box pushes only, optionally with forced pushes along tunnels folded
+into one. Solutions are expanded back into step-by-step states
+afterwards so they can be printed as usual.
+"""
+
+from collections import deque
+
+import movement
+from state import State
+
+
+def reachable(state: State) -> bytearray:
+    """
+    Flood fill from the robot; returns a bytearray with a 1 for every
+    cell the robot can walk to without pushing a box.
+    """
+    board = state.board
+    walls = board.walls
+    offsets = board.offsets
+    occupied = set(state.specific_boxes)
+    occupied.update(state.generic_boxes)
+
+    region = bytearray(board.size)
+    region[state.robot] = 1
+    queue = deque([state.robot])
+    while queue:
+        cell = queue.popleft()
+        for offset in offsets:
+            neighbor = cell + offset
+            if (
+                not region[neighbor]
+                and not walls[neighbor]
+                and neighbor not in occupied
+            ):
+                region[neighbor] = 1
+                queue.append(neighbor)
+    return region
+
+
+def normalize(state: State) -> State:
+    """
+    Moves the robot to the smallest cell of its reachable region, so
+    that states which only differ by where the robot stands within the
+    same region compare equal. Mutates and returns the state.
+    """
+    state.move_robot(reachable(state).index(1))
+    return state
+
+
+def push_successors(state: State):
+    """
+    Generates every state reachable from the supplied one with a single
+    box push (after walking the robot to the box).
+    """
+    board = state.board
+    region = reachable(state)
+    for box in state.specific_boxes + state.generic_boxes:
+        for direction, offset in enumerate(board.offsets):
+            pusher = box - offset
+            if not region[pusher]:
+                continue
+            new_state = State(
+                board=board,
+                robot=state.robot,
+                specific_boxes=state.specific_boxes,
+                generic_boxes=state.generic_boxes,
+                parent=state,
+                last_move=direction,
+                move_count=state.move_count,
+                zobrist=state.zobrist,
+            )
+            new_state.move_robot(pusher)
+            # move_actor counts the push as one move, so move_count is
+            # the number of pushes in this search space
+            if movement.move_actor(new_state, pusher, direction):
+                yield normalize(new_state)
+
+
+def forced_push(state: State, box: int, direction: int) -> bool:
+    """
+    Returns whether pushing the box at cell box in the given direction
+    is the only push the state allows (deadlock patterns aside), so that
+    every way on from the state starts with it.
+    """
+    board = state.board
+    walls = board.walls
+    region = reachable(state)
+    boxes = state.specific_boxes + state.generic_boxes
+    specific_count = len(state.specific_boxes)
+    found = False
+    for position, cell in enumerate(boxes):
+        if position < specific_count:
+            dead = board.dead_specific[position]
+        else:
+            dead = board.dead_generic
+        for push_direction, offset in enumerate(board.offsets):
+            destination = cell + offset
+            if (
+                not region[cell - offset]
+                or walls[destination]
+                or dead[destination]
+                or state.has_box(destination)
+            ):
+                continue
+            if cell != box or push_direction != direction:
+                return False
+            found = True
+    return found
+
+
+def macro_push_successors(state: State):
+    """
+    Like push_successors(), but forced pushes are folded into the push
+    before them. A push that leaves both the box and the robot in a
+    tunnel (see Board.tunnels) is carried on along the tunnel: with
+    walls on both sides the robot can't get around the box, so pushing
+    it further is the only way it can ever leave the tunnel forwards.
+    The box stops on a storage, at the end of the tunnel, or in front
+    of anything that would block the next push. After that, the box is
+    pushed on for as long as that is the only push the robot can make
+    (see forced_push), which covers corridors with openings on one side,
+    tunnel entrances and boxes going into a goal room behind them.
+    """
+    for new_state in push_successors(state):
+        board = new_state.board
+        direction = new_state.last_move
+        tunnel = board.tunnels[direction]
+        offset = board.offsets[direction]
+        # The robot is normalized away after each push; the pushed box
+        # is where it ended up, and the robot stood right behind it
+        _, _, box = movement.moved_box(state, new_state)
+        moved = False
+        if tunnel[box] and tunnel[box - offset]:
+            new_state.move_robot(box - offset)
+            while (
+                tunnel[box]
+                and not board.is_storage(box)
+                and movement.move_actor(new_state, new_state.robot, direction)
+            ):
+                box += offset
+            moved = True
+        while not new_state.is_goal() and forced_push(new_state, box, direction):
+            new_state.move_robot(box - offset)
+            movement.move_actor(new_state, box - offset, direction)
+            box += offset
+            moved = True
+        if moved:
+            normalize(new_state)
+        yield new_state
+
+
+def walk(state: State, target: int):
+    """
+    Returns the shortest list of directions that walks the robot from
+    its current cell to target without pushing any box, or None if the
+    target cannot be reached.
+    """
+    board = state.board
+    occupied = set(state.specific_boxes)
+    occupied.update(state.generic_boxes)
+
+    came_from = {state.robot: None}
+    queue = deque([state.robot])
+    while queue:
+        cell = queue.popleft()
+        if cell == target:
+            break
+        for direction, offset in enumerate(board.offsets):
+            neighbor = cell + offset
+            if (
+                neighbor not in came_from
+                and not board.walls[neighbor]
+                and neighbor not in occupied
+            ):
+                came_from[neighbor] = (cell, direction)
+                queue.append(neighbor)
+
+    if target not in came_from:
+        return None
+
+    moves = []
+    cell = target
+    while came_from[cell] is not None:
+        cell, direction = came_from[cell]
+        moves.append(direction)
+    moves.reverse()
+    return moves
+
+
+def expand_pushes(start_state: State, push_path):
+    """
+    Turns a path of push-level states into the equivalent path of
+    single-step states, starting from the (un-normalized) start state.
+    """
+    path = [start_state]
+    current_state = start_state
+    for parent, child in zip(push_path, push_path[1:]):
+        direction = child.last_move
+        offset = start_state.board.offsets[direction]
+        _, box, destination = movement.moved_box(parent, child)
+        pusher = box - offset
+        # A macro move pushes the same box several cells in a row
+        pushes = (destination - box) // offset
+        for move in walk(current_state, pusher) + [direction] * pushes:
+            current_state = movement.shift_state(current_state, move)
+            path.append(current_state)
+    return path
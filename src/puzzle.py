@@ -0,0 +1,271 @@
+"""
+Reads puzzle files and builds their initial state. A puzzle file holds
+one level in this repository's own symbols (see actor.py); a collection
+file (.xsb, .sok) holds any number of levels in the standard XSB symbols,
+separated by blank lines, titles or comments, and is read as a stream.
+A single level of a collection is named "path#n", n counting from 1.
+"""
+
+import os
+import re
+
+import actor as act
+from board import Board
+from state import State
+
+# File extensions of level collections
+COLLECTION_EXTENSIONS = (".xsb", ".sok")
+
+# Symbols that are a wall or plain floor, and nothing else
+WALL_SYMBOLS = act.WALL + act.XSB_WALL
+FLOOR_SYMBOLS = act.EMPTY + act.XSB_FLOORS
+
+# Translation table from a row's bytes to its walls (1 for a wall)
+WALL_TABLE = bytes(1 if chr(byte) in WALL_SYMBOLS else 0 for byte in range(256))
+
+# Anything in a row besides walls and floor
+PIECE = re.compile(f"[^{re.escape(WALL_SYMBOLS + FLOOR_SYMBOLS)}]")
+
+# Collection path -> ((modification time, size), level offsets); see
+# level_offsets()
+LEVEL_OFFSETS = {}
+
+# A row of an XSB level: XSB symbols only, with at least one wall
+XSB_ROW = re.compile(
+    f"[{re.escape(act.XSB_SYMBOLS)}]*{re.escape(act.XSB_WALL)}"
+    f"[{re.escape(act.XSB_SYMBOLS)}]*"
+)
+
+
+def parse_level(rows):
+    """
+    Builds the initial state of a level from its rows, in either set of
+    symbols. Rows may be of different lengths (they're padded with
+    floor), and everything the robot can't reach is walled in. Raises
+    ValueError if the level isn't well formed.
+    """
+    width = max((len(row) for row in rows), default=0)
+    height = len(rows)
+    if not width:
+        raise ValueError("Level is empty")
+
+    robots = []
+    walls = bytearray(width * height)
+    specific_boxes = {}
+    specific_storages = {}
+    generic_boxes = []
+    generic_storages = []
+
+    for y_position, row in enumerate(rows):
+        row = row.ljust(width)
+        start = y_position * width
+        try:
+            walls[start : start + width] = row.encode("ascii").translate(WALL_TABLE)
+        except UnicodeEncodeError:
+            raise ValueError(f"Unknown symbol in row {y_position + 1}: {row!r}")
+        # Only the handful of pieces are looked at one by one
+        for match in PIECE.finditer(row):
+            symbol = match.group()
+            cell = start + match.start()
+            if symbol in act.XSB_PIECES:
+                symbol = act.XSB_PIECES[symbol]
+                if len(symbol) == 2:
+                    generic_storages.append(cell)
+                    symbol = symbol[0]
+            if symbol == act.ROBOT:
+                robots.append(cell)
+            elif symbol == act.GENERIC_STORAGE:
+                generic_storages.append(cell)
+            elif symbol == act.GENERIC_BOX:
+                generic_boxes.append(cell)
+            elif act.is_box(symbol):
+                if symbol in specific_boxes:
+                    raise ValueError(f"Level has more than one box {symbol}")
+                specific_boxes[symbol] = cell
+            elif act.is_storage(symbol):
+                if symbol in specific_storages:
+                    raise ValueError(f"Level has more than one storage {symbol}")
+                specific_storages[symbol] = cell
+            else:
+                raise ValueError(
+                    f"Unknown symbol {symbol!r} in row {y_position + 1}"
+                )
+
+    if len(robots) != 1:
+        raise ValueError(f"Level has {len(robots)} robots instead of one")
+    box_symbols = sorted(specific_boxes)
+    storage_symbols = sorted(specific_storages)
+    if [symbol.lower() for symbol in box_symbols] != storage_symbols:
+        raise ValueError(
+            f"Specific boxes {''.join(box_symbols)} don't match "
+            f"storages {''.join(storage_symbols)}"
+        )
+    if len(generic_boxes) > len(generic_storages):
+        raise ValueError(
+            f"Level has {len(generic_boxes)} generic boxes but only "
+            f"{len(generic_storages)} generic storages"
+        )
+
+    # Wall in everything outside the robot's reach (ignoring boxes),
+    # which has to be closed off from the edges
+    inside = bytearray(width * height)
+    inside[robots[0]] = 1
+    stack = [robots[0]]
+    while stack:
+        cell = stack.pop()
+        y_position, x_position = divmod(cell, width)
+        if y_position in (0, height - 1) or x_position in (0, width - 1):
+            raise ValueError("Level isn't enclosed by walls")
+        for neighbor in (cell - width, cell + 1, cell + width, cell - 1):
+            if not walls[neighbor] and not inside[neighbor]:
+                inside[neighbor] = 1
+                stack.append(neighbor)
+    pieces = (
+        generic_boxes
+        + generic_storages
+        + list(specific_boxes.values())
+        + list(specific_storages.values())
+    )
+    if not all(inside[cell] for cell in pieces):
+        raise ValueError("Level has boxes or storages the robot can't reach")
+    for cell in range(width * height):
+        if not inside[cell]:
+            walls[cell] = 1
+
+    board = Board(
+        width,
+        height,
+        walls,
+        [specific_storages[symbol] for symbol in storage_symbols],
+        generic_storages,
+        box_symbols,
+        storage_symbols,
+    )
+
+    return State(
+        board,
+        robots[0],
+        tuple(specific_boxes[symbol] for symbol in box_symbols),
+        tuple(sorted(generic_boxes)),
+    )
+
+
+def is_collection(filepath: str) -> bool:
+    return os.path.splitext(filepath)[1].lower() in COLLECTION_EXTENSIONS
+
+
+def read_levels(filepath: str):
+    """
+    Streams the levels of a collection file, yielding each one's title
+    (the last title or comment line before it, or None) and rows.
+    """
+    title = None
+    rows = []
+    with open(filepath) as collection:
+        for line in collection:
+            line = line.rstrip("\r\n")
+            if XSB_ROW.fullmatch(line):
+                rows.append(line)
+                continue
+            if rows:
+                yield title, rows
+                title = None
+                rows = []
+            text = line.strip().lstrip(";").strip()
+            if text:
+                if text.lower().startswith("title:"):
+                    text = text[len("title:") :].strip()
+                title = text
+    if rows:
+        yield title, rows
+
+
+def load_collection(filepath: str):
+    """
+    Streams the levels of a collection file, yielding each one's title
+    and initial state.
+    """
+    for title, rows in read_levels(filepath):
+        yield title, parse_level(rows)
+
+
+def level_offsets(filepath: str):
+    """
+    Returns the byte offset of each level's first row in a collection
+    file. The offsets are worked out in one pass and remembered until
+    the file changes, so picking levels out of a collection one by one
+    doesn't read it from the start each time.
+    """
+    status = os.stat(filepath)
+    stamp = (status.st_mtime_ns, status.st_size)
+    known = LEVEL_OFFSETS.get(filepath)
+    if known is not None and known[0] == stamp:
+        return known[1]
+
+    offsets = []
+    position = 0
+    in_level = False
+    with open(filepath, "rb") as collection:
+        for line in collection:
+            is_row = XSB_ROW.fullmatch(line.decode("latin-1").rstrip("\r\n"))
+            if is_row and not in_level:
+                offsets.append(position)
+            in_level = bool(is_row)
+            position += len(line)
+    LEVEL_OFFSETS[filepath] = (stamp, offsets)
+    return offsets
+
+
+def read_level(filepath: str, offset: int):
+    """
+    Returns the rows of the collection level starting at a byte offset
+    (see level_offsets).
+    """
+    rows = []
+    with open(filepath, "rb") as collection:
+        collection.seek(offset)
+        for line in collection:
+            line = line.decode("latin-1").rstrip("\r\n")
+            if not XSB_ROW.fullmatch(line):
+                break
+            rows.append(line)
+    return rows
+
+
+def count_levels(filepath: str) -> int:
+    return len(level_offsets(filepath))
+
+
+def locate_level(puzzle: str):
+    """
+    Splits a "path#n" puzzle name into the collection's path and the
+    level's byte offset; a plain puzzle file has no offset (None).
+    """
+    path, _, number = puzzle.partition("#")
+    if not is_collection(path):
+        return puzzle, None
+    index = int(number or 1)
+    offsets = level_offsets(path)
+    if not 1 <= index <= len(offsets):
+        raise ValueError(f"{path} has no level {index}")
+    return path, offsets[index - 1]
+
+
+def initialize_puzzle(filepath: str = "puzzles/mini.txt"):
+    """
+    Read in a puzzle from a file and generate the initial state from it.
+    For a collection, the level is picked with a "#n" suffix (the first
+    level by default).
+    """
+    path, offset = locate_level(filepath)
+    if offset is not None:
+        return parse_level(read_level(path, offset))
+
+    with open(filepath) as puzzle:
+        rows = [row.rstrip("\r\n") for row in puzzle]
+    # Blank lines around the level are not part of it
+    while rows and not rows[-1].strip():
+        rows.pop()
+    while rows and not rows[0].strip():
+        rows.pop(0)
+    return parse_level(rows)
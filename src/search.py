@@ -0,0 +1,521 @@
+"""
+Contains the search algorithms: fringe-based search (BFS, DFS, GBFS and
+A*), IDA* and bidirectional search, over single robot steps, whole box
+pushes, or pushes with forced pushes as macro moves (bidirectional
+search only works over plain pushes).
+"""
+
+import copy
+
+import anytime
+import bidirectional as bd
+import canonical
+import deadlock
+import fringe as fr
+import hda
+import heuristics as heur
+import history as hist
+import ida
+import numpy_engine
+import pushes as pu
+import visited
+from cache import state_key
+from movement import replay, step_successors
+from state import State
+
+A_STAR = ("A*", "a*", "astar", "AStar", "A Star", "a star")
+
+# Algorithms with a search loop of their own instead of run_search()'s,
+# which don't use its closed set
+OWN_LOOP_ALGORITHMS = (
+    ida.ALGORITHMS + bd.ALGORITHMS + hda.ALGORITHMS + anytime.ALGORITHMS
+)
+
+# Single robot steps, whole box pushes, or pushes with forced pushes
+# folded into one (see pushes.macro_push_successors)
+SEARCH_SPACES = ("steps", "pushes", "macros")
+
+
+class SearchStats:
+    """
+    Counters collected during a search.
+    """
+
+    def __init__(self):
+        # Number of states examined (popped from the fringe)
+        self.expanded = 0
+        # Number of successors generated, duplicates included
+        self.generated = 0
+        # Approximate bytes the visited set took up in memory and on
+        # disk (fringe-based searches with a visited store only)
+        self.visited_memory = 0
+        self.visited_disk = 0
+
+
+def recover_solution_path(solution_state):  # Written by ChatGPT
+    """
+    Given a solved state, return the path used to get there.
+    """
+    path = []
+    current_state = solution_state
+    while current_state is not None:
+        path.append(current_state)
+        current_state = current_state.parent
+    # Reverse the path to get it from start to solution
+    path.reverse()
+    return path
+
+
+def run_search(
+    root_state,
+    algorithm,
+    heuristic_function,
+    successors,
+    stats,
+    on_expand=None,
+    closed_set=None,
+    history=None,
+    fringe=None,
+):
+    """
+    Runs the fringe-based search (BFS, DFS, GBFS or A*) from the root
+    state, counting into stats (a SearchStats).
+    on_expand(current_state, fringe, iterations) is called for every
+    examined state; if it returns True, the search is abandoned.
+    If a SearchHistory is given, queued states record how they were
+    reached there and drop their parent. A fringe for the algorithm can
+    be passed in, for successors that look ahead in it.
+    Returns whether it was solved and the last state examined.
+    """
+    if fringe is None:
+        fringe = fr.FringeFactory.create_fringe(algorithm)
+    if closed_set is None:
+        closed_set = set()
+
+    if history is not None:
+        root_state.index = 0
+    fringe.add(root_state)
+
+    solved = False
+    current_state: State = None
+
+    while solved == False and fringe:
+
+        current_state = fringe.pop()
+        closed_set.add(current_state)
+
+        solved = current_state.is_goal()
+        stats.expanded += 1
+
+        if on_expand is not None and on_expand(
+            current_state, fringe, stats.expanded
+        ):
+            break
+
+        # generate new states
+        for new_state in successors(current_state):
+            stats.generated += 1
+            if new_state not in closed_set:
+                new_state_score = heuristic_function.update(current_state, new_state)
+
+                if (
+                    new_state_score != -1
+                ):  # For custom heuristic; -1 denotes a stuck box
+                    if algorithm in A_STAR:
+                        new_state_score += new_state.move_count
+                    new_state.heuristic_score = new_state_score
+                    if history is not None:
+                        new_state.index = history.add(current_state, new_state)
+                        new_state.parent = None
+                    fringe.add(new_state)
+
+                closed_set.add(
+                    new_state
+                )  # Add the state to the closed list even if a box is stuck
+
+    return solved, current_state
+
+
+def run_ida(
+    root_state, heuristic_function, successors, table_size, stats, on_expand=None
+):
+    """
+    Runs IDA* from the root state. on_expand works as in run_search(),
+    with the current search path in place of the fringe. Returns the
+    same values as run_search().
+    """
+    search = ida.IDAStar(heuristic_function, successors, table_size)
+
+    def on_ida_expand(current_state, path):
+        return on_expand(current_state, path, search.iterations)
+
+    solution = search.search(root_state, on_ida_expand if on_expand else None)
+    stats.expanded = search.iterations
+    stats.generated = search.generated
+    return solution is not None, solution
+
+
+def run_bidirectional(
+    root_state, heuristic_function, successors, stats, on_expand=None
+):
+    """
+    Runs bidirectional search from the (normalized) root state, with
+    successors generating the forward side's children. on_expand works
+    as in run_search(), with the fringe of the side being expanded.
+    Returns the same values as run_search().
+    """
+    search = bd.BidirectionalSearch(heuristic_function, successors)
+
+    def on_bidirectional_expand(current_state, fringe):
+        return on_expand(current_state, fringe, search.iterations)
+
+    solution = search.search(
+        root_state, on_bidirectional_expand if on_expand else None
+    )
+    stats.expanded = search.iterations
+    stats.generated = search.generated
+    return solution is not None, solution
+
+
+def run_hda(
+    root_state, heuristic, search_space, workers, deadlocks, stats, on_expand=None
+):
+    """
+    Runs HDA* from the (normalized, for pushes) root state on workers
+    processes. Expansions happen in the workers, so on_expand is called
+    with the root state and no fringe every hda.IDLE_WAIT seconds,
+    with the number of states expanded so far; it can still stop the
+    search. Returns the same values as run_search().
+    """
+    search = hda.HDAStar(heuristic, search_space, workers, deadlocks)
+
+    def on_hda_wait(expanded):
+        return on_expand(root_state, (), expanded)
+
+    solution = search.search(root_state, on_hda_wait if on_expand else None)
+    stats.expanded = search.iterations
+    stats.generated = search.generated
+    return solution is not None, solution
+
+
+def run_anytime(
+    root_state, heuristic_function, successors, stats, on_expand=None, on_solution=None
+):
+    """
+    Runs ARA* from the root state. on_expand works as in run_search();
+    on_solution(goal_state) is called with each shorter solution found.
+    Returns whether any solution was found and the best one's goal
+    state.
+    """
+    search = anytime.AnytimeSearch(heuristic_function, successors)
+
+    def on_anytime_expand(current_state, fringe):
+        return on_expand(current_state, fringe, search.iterations)
+
+    solution = search.search(
+        root_state, on_anytime_expand if on_expand else None, on_solution
+    )
+    stats.expanded = search.iterations
+    stats.generated = search.generated
+    return solution is not None, solution
+
+
+def observe(metrics, on_expand):
+    """
+    Chains metrics.observe() in front of an on_expand callback.
+    """
+
+    def on_expand_observed(current_state, fringe, iterations):
+        metrics.observe(fringe, iterations)
+        if on_expand is not None:
+            return on_expand(current_state, fringe, iterations)
+        return False
+
+    return on_expand_observed
+
+
+def prune_dead(successors, dead):
+    """
+    Wraps a successor function to skip states whose configuration is in
+    the dead set (see cache.SolutionCache.dead_configurations).
+    """
+
+    def live_successors(state):
+        for new_state in successors(state):
+            if state_key(new_state) not in dead:
+                yield new_state
+
+    return live_successors
+
+
+def watch_abort(on_expand):
+    """
+    Wraps an on_expand callback to remember (in its aborted attribute)
+    whether it ever stopped the search.
+    """
+
+    def on_expand_watched(current_state, fringe, iterations):
+        if on_expand is not None and on_expand(current_state, fringe, iterations):
+            on_expand_watched.aborted = True
+            return True
+        return False
+
+    on_expand_watched.aborted = False
+    return on_expand_watched
+
+
+def check_options(
+    algorithm: str,
+    search_space: str = "steps",
+    verify_heuristic: bool = False,
+    cache=None,
+    canonical_states: bool = False,
+    compact: bool = False,
+    engine: str = "python",
+    queue: str = "heap",
+    visited_store: str = "states",
+):
+    """
+    Raises ValueError if search() can't run with these options together
+    (they mean the same as there), before anything is searched.
+    """
+    if search_space not in SEARCH_SPACES:
+        raise ValueError(f"Unknown search space: {search_space}")
+    if compact and canonical_states:
+        raise ValueError("Compact search can't detect duplicates by canonical key")
+    if algorithm in bd.ALGORITHMS and search_space != "pushes":
+        raise ValueError("Bidirectional search needs the pushes search space")
+    if visited_store != "states" and canonical_states:
+        raise ValueError("Canonical duplicate detection needs the states visited store")
+    if engine not in numpy_engine.ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    if engine == "numpy" and search_space != "steps":
+        raise ValueError("The numpy engine only generates single steps")
+    if algorithm in hda.ALGORITHMS:
+        # HDA*'s workers build their own successor function, heuristic
+        # and closed set from the search space and heuristic names
+        for option, used in (
+            ("compact", compact),
+            ("canonical_states", canonical_states),
+            ("verify_heuristic", verify_heuristic),
+            ("cache", cache is not None),
+            ("engine", engine != "python"),
+            ("queue", queue != "heap"),
+            ("visited_store", visited_store != "states"),
+        ):
+            if used:
+                raise ValueError(f"HDA* doesn't support the {option} option")
+
+
+def search(
+    start_state: State,
+    algorithm: str = "BFS",
+    heuristic: str = "Manhattan",
+    search_space: str = "steps",
+    on_expand=None,
+    verify_heuristic: bool = False,
+    table_size: int = ida.TABLE_SIZE,
+    metrics=None,
+    cache=None,
+    deadlocks: bool = True,
+    canonical_states: bool = False,
+    compact: bool = False,
+    engine: str = "python",
+    queue: str = "heap",
+    visited_store: str = "states",
+    visited_budget: int = visited.MEMORY_BUDGET,
+    workers: int = 0,
+    on_solution=None,
+    deadlock_table=None,
+):
+    """
+    Searches for a solution from the start state. Returns the solution
+    path as single-step states (as print_solution expects), or None if
+    no solution was found, and the SearchStats of the search. If a
+    Metrics (see metrics.py) is given, it is filled in as the search
+    runs. If a SolutionCache (see cache.py) is given, a cached solution
+    is returned straight away, known dead configurations are pruned, and
+    the outcome is stored for next time. With deadlocks, children whose
+    pushed box is frozen off its storage are pruned (see deadlock.py).
+    With canonical_states, the fringe-based searches detect duplicates
+    by canonical key (see canonical.py) instead of exact position.
+    With compact, they record states' parents in a SearchHistory and
+    their closed set as packed keys (see history.py), so expanded
+    states can be freed. engine picks how single steps are generated:
+    "numpy" uses the vectorized NumpyEngine (see numpy_engine.py).
+    queue picks the priority queue GBFS and A* use (see
+    FringeFactory.QUEUES). visited_store picks how the fringe-based
+    searches store visited states (see visited.py); the "mmap" store
+    spills to disk past visited_budget bytes. HDA* runs on workers
+    processes (0 for one per core; see hda.py). ARA* (see anytime.py)
+    calls on_solution(path) with each shorter solution it finds, and
+    if on_expand stops it, returns the shortest one found so far.
+    A deadlock_table (a DeadlockTable of the start state's board) is
+    used instead of a fresh one, keeping the patterns it learned before.
+    """
+    check_options(
+        algorithm,
+        search_space,
+        verify_heuristic,
+        cache,
+        canonical_states,
+        compact,
+        engine,
+        queue,
+        visited_store,
+    )
+
+    heuristic_function = heur.HeuristicFactory.create_heuristic(
+        heuristic, verify_heuristic
+    )
+
+    if search_space != "steps":
+        if search_space == "macros":
+            successors = pu.macro_push_successors
+        else:
+            successors = pu.push_successors
+        # Copy the start state so the robot's real position is kept for
+        # expanding the solution afterwards
+        root_state = pu.normalize(copy.copy(start_state))
+    elif engine == "numpy":
+        successors = numpy_engine.NumpyEngine(start_state.board)
+        root_state = start_state
+    else:
+        successors = step_successors
+        root_state = start_state
+
+    # The unwrapped successor function, for replaying a compact history
+    base_successors = successors
+    if metrics is not None:
+        successors = metrics.unpruned(successors)
+
+    stats = SearchStats()
+    if cache is not None:
+        configuration = f"{algorithm}|{heuristic}|{search_space}"
+        moves = cache.get_solution(start_state, configuration)
+        dead = cache.dead_configurations(start_state.board) if moves is None else ()
+        # Dead configurations are stored normalized, as in the push
+        # search spaces
+        dead_root = pu.normalize(copy.copy(start_state))
+        if moves is not None or state_key(dead_root) in dead:
+            # Answered without searching; the metrics still get a sample
+            if metrics is not None:
+                metrics.start()
+                metrics.sample()
+            if moves is None:
+                return None, stats
+            return replay(start_state, moves), stats
+        if dead and search_space != "steps":
+            successors = prune_dead(successors, dead)
+
+    if deadlocks:
+        if deadlock_table is None:
+            deadlock_table = deadlock.DeadlockTable(start_state.board)
+        successors = deadlock_table.successors(successors)
+
+    store = visited.create_store(visited_store, start_state, visited_budget)
+    closed_set = store
+    history = None
+    if canonical_states:
+        closed_set = canonical.CanonicalClosedSet(start_state.board, search_space)
+    elif compact and algorithm not in OWN_LOOP_ALGORITHMS:
+        # A packed key store already frees the states; the states store
+        # gives way to one keyed by their hashes
+        if visited_store == "states":
+            closed_set = hist.ZobristSet(visited.create_packer(start_state))
+        history = hist.SearchHistory()
+    measure_store = (
+        closed_set is store and algorithm not in OWN_LOOP_ALGORITHMS
+    )
+    if metrics is not None:
+        successors = metrics.successors(successors)
+        heuristic_function = metrics.heuristic(heuristic_function)
+        closed_set = metrics.closed_set(closed_set)
+        on_expand = observe(metrics, on_expand)
+        metrics.start()
+    # Pushes onto dead squares are counted where they're refused, and
+    # only while this search runs (set either way, in case an earlier
+    # search raised before clearing it)
+    board = start_state.board
+    board.on_dead_push = None if metrics is None else metrics.dead_push
+    if cache is not None:
+        # Outermost, so its aborted attribute survives the other wrappers
+        on_expand = watch_abort(on_expand)
+
+    if algorithm in ida.ALGORITHMS:
+        solved, current_state = run_ida(
+            root_state, heuristic_function, successors, table_size, stats, on_expand
+        )
+    elif algorithm in anytime.ALGORITHMS:
+
+        def on_goal(goal_state):
+            if on_solution is not None:
+                path = recover_solution_path(goal_state)
+                if search_space != "steps":
+                    path = pu.expand_pushes(start_state, path)
+                on_solution(path)
+
+        solved, current_state = run_anytime(
+            root_state, heuristic_function, successors, stats, on_expand, on_goal
+        )
+    elif algorithm in hda.ALGORITHMS:
+        solved, current_state = run_hda(
+            root_state, heuristic, search_space, workers, deadlocks, stats, on_expand
+        )
+    elif algorithm in bd.ALGORITHMS:
+        solved, current_state = run_bidirectional(
+            root_state, heuristic_function, successors, stats, on_expand
+        )
+    else:
+        fringe = fr.FringeFactory.create_fringe(algorithm, queue)
+        if engine == "numpy":
+            base_successors.attach(fringe)
+        solved, current_state = run_search(
+            root_state,
+            algorithm,
+            heuristic_function,
+            successors,
+            stats,
+            on_expand,
+            closed_set,
+            history,
+            fringe,
+        )
+
+    board.on_dead_push = None
+    if metrics is not None:
+        metrics.sample()
+    if measure_store:
+        stats.visited_memory, stats.visited_disk = store.footprint()
+
+    if not solved:
+        # Every state the search reached is as dead as the start, but
+        # only if duplicates were told apart by exact position (canonical
+        # keys also merge symmetric positions), as nothing stored as
+        # dead is ever checked again
+        if cache is not None and not on_expand.aborted and not canonical_states:
+            dead_states = [dead_root]
+            # (a compact search or one storing keys doesn't have them)
+            if (
+                search_space != "steps"
+                and history is None
+                and visited_store == "states"
+            ):
+                dead_states.extend(closed_set)
+            cache.put_dead(start_state.board, dead_states)
+        return None, stats
+
+    if history is not None:
+        path = hist.replay_moves(
+            root_state, history.moves_to(current_state.index), base_successors
+        )
+    else:
+        path = recover_solution_path(current_state)
+    if search_space != "steps":
+        path = pu.expand_pushes(start_state, path)
+    # A search cut short may not have found its best solution yet
+    if cache is not None and not on_expand.aborted:
+        cache.put_solution(
+            start_state, configuration, [state.last_move for state in path[1:]]
+        )
+    return path, stats
@@ -0,0 +1,287 @@
+"""
+Solver service: a long-lived process that answers JSON-RPC 2.0 requests,
+one JSON object per line, on standard input and output or on a Unix
+socket. Imports happen once, and puzzles stay warm in a Session (see
+api.py) from one request to the next, so a solve request only pays for
+the search itself.
+
+Usage:
+    python service.py
+    python service.py --socket /tmp/sokoban.sock
+
+Methods:
+    solve(puzzle, algorithm="A*", heuristic="matching",
+          search_space="pushes", time_limit=None, memory_limit=None)
+        Solves a puzzle, given as a file name ("path#n" for a level of
+        a collection) or as the rows of a level, and returns its record
+        (see api.Result.to_dict). memory_limit is in megabytes and
+        counts the whole service process.
+        While it runs, each solution found (with ARA*, every shorter one
+        in turn) is sent ahead as a "solution" notification with the
+        request's id, the LURD moves, their length and the wall time.
+    forget(puzzle=None)
+        Drops a puzzle (every puzzle by default) from the session.
+    shutdown()
+        Stops the service once it has answered.
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import stat
+import sys
+
+from api import MAX_PUZZLES, Limits, Session
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class RPCError(Exception):
+    """
+    A JSON-RPC error response: its code and message.
+    """
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class Service:
+    """
+    Answers requests against one Session. Requests are handled one at a
+    time, in the order they arrive.
+    """
+
+    def __init__(self, max_puzzles: int = MAX_PUZZLES):
+        self.session = Session(max_puzzles)
+        self.stopped = False
+        # Sends a notification (a dict) to the client, if any
+        self.notify = None
+        # Id of the request being handled
+        self.request_id = None
+        self.methods = {
+            "solve": self.solve,
+            "forget": self.forget,
+            "shutdown": self.shutdown,
+        }
+
+    def handle(self, line: str):
+        """
+        Answers one line of input; returns the response line, or None
+        for a notification (a request without an id).
+        """
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as error:
+                raise RPCError(PARSE_ERROR, f"Parse error: {error}")
+            if not isinstance(request, dict) or request.get("jsonrpc") != "2.0":
+                raise RPCError(INVALID_REQUEST, "Invalid request")
+            request_id = request.get("id")
+            self.request_id = request_id
+            method = self.methods.get(request.get("method"))
+            if method is None:
+                raise RPCError(
+                    METHOD_NOT_FOUND, f"Method not found: {request.get('method')}"
+                )
+            params = request.get("params", {})
+            if isinstance(params, list):
+                result = method(*params)
+            elif isinstance(params, dict):
+                result = method(**params)
+            else:
+                raise RPCError(INVALID_PARAMS, "Params must be an array or object")
+            if "id" not in request:
+                return None
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except RPCError as error:
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": error.code, "message": error.message},
+            }
+        except OSError as error:
+            # A puzzle file that went missing after it was checked
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": INVALID_PARAMS, "message": str(error)},
+            }
+        except TypeError as error:
+            # Missing or unexpected params
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": INVALID_PARAMS, "message": str(error)},
+            }
+        except Exception as error:
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {
+                    "code": INTERNAL_ERROR,
+                    "message": f"{type(error).__name__}: {error}",
+                },
+            }
+        return json.dumps(response)
+
+    def solve(
+        self,
+        puzzle,
+        algorithm: str = "A*",
+        heuristic: str = "matching",
+        search_space: str = "pushes",
+        time_limit: float = None,
+        memory_limit: float = None,
+    ):
+        if not isinstance(puzzle, (str, list)):
+            raise RPCError(INVALID_PARAMS, "puzzle must be a file name or rows")
+        self.check_file(puzzle)
+        if memory_limit is not None:
+            memory_limit = int(memory_limit * 1024**2)
+        limits = Limits(time_limit, memory_limit)
+        request_id = self.request_id
+
+        def on_solution(moves: str, elapsed: float):
+            if self.notify is not None:
+                self.notify(
+                    {
+                        "jsonrpc": "2.0",
+                        "method": "solution",
+                        "params": {
+                            "id": request_id,
+                            "moves": moves,
+                            "length": len(moves),
+                            "wall_time": round(elapsed, 4),
+                        },
+                    }
+                )
+
+        return self.session.solve(
+            puzzle, algorithm, heuristic, limits, search_space, on_solution
+        ).to_dict()
+
+    def forget(self, puzzle=None):
+        if puzzle is not None:
+            self.check_file(puzzle)
+        self.session.forget(puzzle)
+        return len(self.session.puzzles)
+
+    def check_file(self, puzzle):
+        """
+        Raises an invalid params error if a puzzle given as a file name
+        can't be read.
+        """
+        if not isinstance(puzzle, str):
+            return
+        try:
+            os.stat(puzzle.partition("#")[0])
+        except OSError as error:
+            raise RPCError(INVALID_PARAMS, f"Can't read puzzle {puzzle}: {error}")
+
+    def shutdown(self):
+        self.stopped = True
+        return True
+
+
+def serve_stream(service: Service, reader, writer):
+    """
+    Answers requests line by line from reader until it runs out or the
+    service is shut down.
+    """
+
+    def notify(message):
+        writer.write(json.dumps(message) + "\n")
+        writer.flush()
+
+    service.notify = notify
+    for line in reader:
+        if not line.strip():
+            continue
+        response = service.handle(line)
+        if response is not None:
+            writer.write(response + "\n")
+            writer.flush()
+        if service.stopped:
+            break
+
+
+class TextWriter:
+    """
+    Writes text to a binary stream.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text: str):
+        self.stream.write(text.encode())
+
+    def flush(self):
+        self.stream.flush()
+
+
+def serve_socket(service: Service, path: str):
+    """
+    Listens on a Unix socket at path, serving one connection at a time.
+    """
+    # A socket left behind by an earlier run would stop the bind
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            reader = (line.decode() for line in self.rfile)
+            serve_stream(service, reader, TextWriter(self.wfile))
+
+    with socketserver.UnixStreamServer(path, Handler) as server:
+        try:
+            while not service.stopped:
+                server.handle_request()
+        finally:
+            os.unlink(path)
+
+
+def process_args():
+    """
+    Parses arguments from the CLI.
+
+    Returns:
+        A Namespace object where attributes correspond to the
+        defined/provided args.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help="Unix socket to listen on (defaults to standard input and output).",
+    )
+    parser.add_argument(
+        "--max-puzzles",
+        type=int,
+        default=MAX_PUZZLES,
+        help="Number of puzzles kept warm between requests.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = process_args()
+    service = Service(args.max_puzzles)
+    if args.socket is not None:
+        serve_socket(service, args.socket)
+    else:
+        serve_stream(service, sys.stdin, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
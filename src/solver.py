@@ -1,236 +1,67 @@
 """
-Contains the main driving logic as well as the search algorithm itself.
+Contains the main driving logic: the command-line interface and the
+output to the terminal. The search itself lives in search.py.
 """
 
 import argparse
-import copy
 import os
-import string
 import sys
 import time
 from collections import deque
 
 import psutil
 
-import actor as act
-import fringe as fr
-import heuristics as heur
-from actor import Actor
-from state import State
+import cache
+import ida
+import portfolio
+from fringe import FringeFactory
+from metrics import Metrics
+from movement import lurd, replay
+from numpy_engine import ENGINES
+from puzzle import initialize_puzzle
+from search import SEARCH_SPACES, check_options, search
+from visited import MEMORY_BUDGET, STORES
 
 directions = {0: "North", 1: "East", 2: "South", 3: "West"}
 
 
-def shift_state(state: State, direction: int) -> State:
+def render_solution(solution_path):
     """
-    Given a state and movement direction, returns the state that
-    results from moving the robot in that direction. If the move is
-    impossible, return None.
+    Generator yielding the rendering of each step of the solution path
+    in turn, so steps can be written out as they are rendered.
     """
-
-    # Deep copy only the state attributes that can vary between states
-    new_map, new_robot, new_specific_boxes, new_generic_boxes = copy.deepcopy(
-        (state.mapped_actors, state.robot, state.specific_boxes, state.generic_boxes)
-    )
-    # Static parts of the puzzle are shared between parent & child.
-    new_state = State(
-        mapped_actors=new_map,
-        robot=new_robot,
-        specific_boxes=new_specific_boxes,
-        generic_boxes=new_generic_boxes,
-        specific_storages=state.specific_storages,
-        generic_storages=state.generic_storages,
-        parent=state,
-        last_move=direction,
-        move_count=state.move_count,
-    )
-
-    robot_y_position = state.robot.y_position
-    robot_x_position = state.robot.x_position
-
-    if move_actor(new_state, robot_y_position, robot_x_position, direction):
-        return new_state
-
-    return None
-
-
-def move_actor(
-    state: State, initial_y_position: int, initial_x_position: int, direction: int
-) -> bool:
-    """
-    Modifies a state by moving an object in the supplied direction from
-    its initial position; contains the actual movement logic, and
-    mutates the state supplied in the parameters.
-    """
-    x_offset = 0
-    y_offset = 0
-    if direction == 0:  # 0 => north
-        y_offset = -1
-    elif direction == 1:  # 1 => east
-        x_offset = 1
-    elif direction == 2:  # 2 => south
-        y_offset = 1
-    elif direction == 3:  # 3 => west
-        x_offset = -1
-
-    # Retrieve the actor that is to be moved
-    actor = state.mapped_actors[initial_y_position][initial_x_position]
-
-    # Retrieve the actor in the destination space, if applicable
-    destination = state.mapped_actors[initial_y_position + y_offset][
-        initial_x_position + x_offset
-    ]
-
-    if destination != None:
-        # Check for being blocked by a wall or a box being blocked by another box
-        if destination.symbol == "O" or (act.is_box(actor) and act.is_box(destination)):
-            return False
-        # Handle the case where the robot is attempting to push a box
-        elif actor.symbol == "R" and act.is_box(destination):
-            # Recursive call in order to try to move the box itself
-            push_block = move_actor(
-                state, destination.y_position, destination.x_position, direction
-            )
-            # If the box fails to move, so does the robot
-            if push_block == False:
-                return False
-            # If the box has successfully moved, the robot moves
-            elif push_block == True:
-                move_actor(state, initial_y_position, initial_x_position, direction)
-                state.move_count -= 1
-                return True
-
-    # If applicable, record the storage the actor was standing on
-    # before moving
-    previously_occupied = actor.standing_on
-    # Update standing_on to reflect the storage (if applicable) the
-    # actor is moving onto
-    if destination is not None and act.is_storage(destination):
-        actor.standing_on = destination
-    else:
-        actor.standing_on = None
-
-    # Update the actor's position
-    actor.x_position += x_offset
-    actor.y_position += y_offset
-    # Move the actor on the moved_actors 2D array
-    state.mapped_actors[initial_y_position + y_offset][
-        initial_x_position + x_offset
-    ] = actor
-    # If applicable, restore previously-covered storage
-    state.mapped_actors[initial_y_position][initial_x_position] = previously_occupied
-
-    state.move_count += 1
-
-    return True
-
-
-def recover_solution_path(solution_state):  # Written by ChatGPT
-    """
-    Given a solved state, return the path used to get there.
-    """
-    path = []
-    current_state = solution_state
-    while current_state is not None:
-        path.append(current_state)
-        current_state = current_state.parent
-    # Reverse the path to get it from start to solution
-    path.reverse()
-    return path
+    for step_count, state in enumerate(solution_path):
+        if state.last_move != None:
+            heading = f"Step {step_count} - Move {directions[state.last_move]}:"
+        else:
+            heading = f"Step {step_count} - "
+        yield f"{heading}\n{state}\n---------------------------------"
 
 
 def print_solution(solution_path):
     """
     Print the solution path step-by-step with 2D grid visualization.
     """
-    step_count = 0
     print("Solution path:\n---------------------------------")
-    for state in solution_path:
-        last_direction = None
-
-        if state.last_move != None:
-            last_direction = directions[state.last_move]
-
-        print(f"Step {step_count} - ", end="")
-        if last_direction != None:
-            print(f"Move {last_direction}:")
-        else:
-            print("")
-
-        print(state)
-        step_count += 1
-        print("---------------------------------")
+    for step in render_solution(solution_path):
+        print(step)
     print("Solved! Full solution path above.")
 
 
-def initialize_puzzle(filepath: string = "puzzles/mini.txt"):
+def show_solution(args, solution_path):
     """
-    Read in a puzzle from a file and generate the initial state from it.
+    Print the solution path, as a LURD string if asked for one.
     """
-    # https://www.programiz.com/python-programming/examples/read-line-by-line
-    with open(filepath) as puzzle:
-        map = puzzle.readlines()
-        map_rows = [row.strip() for row in map]
-
-    map_height = len(map_rows)
-    map_width = len(map_rows[0])
-
-    robot = Actor("R", -1, -1)
-    specific_boxes = [None] * 255
-    specific_storages = [None] * 255
-
-    generic_boxes = []
-    generic_storages = []
-
-    mapped_actors = [[None for column in range(map_width)] for row in range(map_height)]
-
-    # Read each part of the map one-by-one and add to mapped_actors,
-    # generic_storages, generic_boxes, specific_boxes, and
-    # specific_storages, respectively.
-    for i in range(map_height):
-        for j in range(map_width):
-            current_tile = map_rows[i][j]
-            new_actor = None
-            if current_tile != " ":
-                new_actor = Actor(current_tile, i, j)
-                if current_tile == "R":
-                    robot = new_actor
-                elif current_tile == "S":
-                    generic_storages.append(new_actor)
-                elif current_tile == "X":
-                    generic_boxes.append(new_actor)
-                elif current_tile != "O":
-                    if current_tile.isupper():
-                        specific_boxes[ord(current_tile)] = new_actor
-                    else:
-                        specific_storages[ord(current_tile)] = new_actor
-            mapped_actors[i][j] = new_actor
-
-    # Exclude None from boxes/storages
-    specific_boxes = [actor for actor in specific_boxes if actor is not None]
-    specific_storages = [
-        receptacle for receptacle in specific_storages if receptacle is not None
-    ]
-
-    start_state = State(
-        mapped_actors,
-        robot,
-        specific_boxes,
-        generic_boxes,
-        specific_storages,
-        generic_storages,
-    )
-
-    return start_state
+    if args.lurd:
+        print(lurd(solution_path))
+    else:
+        print_solution(solution_path)
 
 
-def clear_screen():  # By ChatGPT
-    # For Windows
-    if os.name == "nt":
-        os.system("cls")
-    # For Unix/Linux/Mac
-    else:
-        os.system("clear")
+def clear_screen():
+    # ANSI escape sequence: move the cursor home and clear the screen,
+    # without starting a shell to run cls/clear
+    print("\033[H\033[2J", end="")
 
 
 def process_args():
@@ -246,7 +77,7 @@ def process_args():
         "--puzzle",
         type=str,
         default="puzzles/tiny.txt",
-        help="Path to the puzzle input file.",
+        help="Path to the puzzle input file; for an .xsb or .sok collection, append #n to pick its n-th level.",
     )
     parser.add_argument(
         "--algorithm",
@@ -258,7 +89,113 @@ def process_args():
         "--heuristic",
         type=str,
         default="Manhattan",
-        help="State prioritization heuristic (used in GBFS and A* only)",
+        help="State prioritization heuristic (used in GBFS, A* and IDA* only)",
+    )
+    parser.add_argument(
+        "--search-space",
+        type=str,
+        choices=SEARCH_SPACES,
+        default="steps",
+        help="Expand single robot steps, whole box pushes (the robot walks freely in between), or pushes with forced pushes (along tunnels, or whenever no other push is possible) taken as one move.",
+    )
+    parser.add_argument(
+        "--portfolio",
+        action="store_true",
+        help="Run several algorithm/heuristic configurations in parallel processes and keep the first solution.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Number of worker processes for HDA* (0 for one per core).",
+    )
+    parser.add_argument(
+        "--table-size",
+        type=int,
+        default=ida.TABLE_SIZE,
+        help="Maximum number of entries in the IDA* transposition table.",
+    )
+    parser.add_argument(
+        "--verify-heuristic",
+        action="store_true",
+        help="Check every incrementally computed heuristic score against a full recompute (slow; for debugging).",
+    )
+    parser.add_argument(
+        "--canonical",
+        action="store_true",
+        help="Detect duplicate states by box layout plus robot region (and board symmetry) rather than exact robot cell; over single steps this can lengthen solutions.",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Keep only a compact move history and the packed positions of seen states instead of the states themselves (BFS, DFS, GBFS and A* only); the solution is rebuilt by replaying it.",
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=ENGINES,
+        default="python",
+        help="Move generation engine for the steps search space; numpy expands batches of states with array operations (needs NumPy).",
+    )
+    parser.add_argument(
+        "--queue",
+        type=str,
+        choices=FringeFactory.QUEUES,
+        default="heap",
+        help="Priority queue for GBFS and A*: a binary heap, or buckets by integer score that break ties toward states with more moves.",
+    )
+    parser.add_argument(
+        "--visited-store",
+        type=str,
+        choices=STORES,
+        default="states",
+        help="How visited states are stored: the states themselves, their positions packed into integer keys, or packed keys that spill into a memory-mapped hash table in a temporary file once they outgrow --visited-budget.",
+    )
+    parser.add_argument(
+        "--visited-budget",
+        type=float,
+        default=MEMORY_BUDGET / (1024**2),
+        help="Megabytes of packed keys the mmap visited store keeps in memory before spilling to disk.",
+    )
+    parser.add_argument(
+        "--lurd",
+        action="store_true",
+        help="Print the solution as a single LURD move string (uppercase letters are pushes) instead of step by step.",
+    )
+    parser.add_argument(
+        "--no-deadlock-patterns",
+        action="store_true",
+        help="Don't prune states with frozen boxes off their storages (see deadlock.py).",
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        default=None,
+        help="SQLite file to cache solutions (and configurations proven dead) in across runs.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=cache.MAX_SOLUTIONS,
+        help="Maximum number of solutions kept in the cache; the least recently used go first.",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        default=None,
+        help="Collect search metrics and write them to this file (CSV if it ends in .csv, JSON otherwise).",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=0.1,
+        help="Number of seconds between samples of the metrics time series.",
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=None,
+        help="Stop searching after this many seconds (with --portfolio, every worker); with ARA*, print the shortest solution found by then.",
     )
     parser.add_argument(  # Can't remember what I intended this for; currently doesn't do anything
         "--optimizations",
@@ -277,7 +214,29 @@ def process_args():
         default=0,
         help="Number of seconds to sleep between each explored state; a throttle to reduce system load.",
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    # The portfolio's workers each run their own configuration and
+    # report only their solution and statistics
+    if args.portfolio and args.cache is not None:
+        parser.error("--cache can't be used with --portfolio")
+    if args.portfolio and args.metrics is not None:
+        parser.error("--metrics can't be used with --portfolio")
+    if not args.portfolio:
+        try:
+            check_options(
+                args.algorithm,
+                args.search_space,
+                args.verify_heuristic,
+                args.cache,
+                args.canonical,
+                args.compact,
+                args.engine,
+                args.queue,
+                args.visited_store,
+            )
+        except ValueError as error:
+            parser.error(str(error))
+    return args
 
 
 def print_update(start_time, process, fringe, current_state, iterations):
@@ -300,6 +259,33 @@ def print_update(start_time, process, fringe, current_state, iterations):
     print(f"Memory usage: {memory_usage_mb:.2f} MB")
 
 
+def run_portfolio(args, start_time):
+    """
+    Solve the puzzle with every configuration in the portfolio at once
+    and print the first solution found, with each worker's statistics.
+    """
+    print(f"Running {len(portfolio.CONFIGURATIONS)} configurations in parallel...")
+    winner, reports = portfolio.solve_portfolio(args.puzzle, timeout=args.time_limit)
+
+    print("Worker statistics:")
+    for report in reports:
+        print(f"  {report}")
+
+    if winner is not None:
+        algorithm, heuristic, search_space = winner.configuration
+        print(f"\nWinner: {algorithm} + {heuristic} ({search_space})")
+        print("A solution has been found!\n")
+        show_solution(args, replay(initialize_puzzle(args.puzzle), winner.moves))
+    elif any(report.cancelled for report in reports):
+        # Without a winner, only the time limit cancels workers
+        print(f"No solution found within {args.time_limit} seconds.")
+    else:
+        print("The fringe has run dry; we seem to be stuck.")
+
+    runtime = time.time() - start_time
+    print(f"Total runtime: {runtime:.4f} seconds")
+
+
 def main():
     """
     Main driver; takes in user input via CLI args, executes the search,
@@ -310,68 +296,90 @@ def main():
 
     args = process_args()
 
-    start_state = initialize_puzzle(args.puzzle)
-    fringe = fr.FringeFactory.create_fringe(args.algorithm)
-    closed_set = set()
-
-    heuristic_function = heur.HeuristicFactory.create_heuristic(args.heuristic)
+    if args.portfolio:
+        run_portfolio(args, start_time)
+        return
 
-    fringe.add(start_state)
+    start_state = initialize_puzzle(args.puzzle)
 
-    solved = False
-    current_state: State = None
-    iterations = 0
     print_time = time.time()
+    timed_out = False
 
-    while solved == False and fringe:
-
-        print_now = time.time() - print_time >= args.print_interval
-
-        current_state = fringe.pop()
-        closed_set.add(current_state)
-
-        solved = current_state.is_goal()
-        iterations += 1
-
-        if print_now:
+    def on_expand(current_state, fringe, iterations):
+        nonlocal print_time
+        if time.time() - print_time >= args.print_interval:
             print_time = time.time()
             print_update(start_time, process, fringe, current_state, iterations)
+        time.sleep(args.sleep_duration)
+        nonlocal timed_out
+        timed_out = (
+            args.time_limit is not None and time.time() - start_time > args.time_limit
+        )
+        return timed_out
+
+    def on_solution(path):
+        elapsed = time.time() - start_time
+        moves = lurd(path)
+        pushes = sum(letter.isupper() for letter in moves)
+        # Flushed, so each solution is kept even if the run is killed
+        print(
+            f"Found a solution of {len(path) - 1} moves ({pushes} pushes) "
+            f"after {elapsed:.4f} seconds:\n{moves}",
+            flush=True,
+        )
+
+    metrics = None
+    if args.metrics is not None:
+        metrics = Metrics(args.metrics_interval)
+
+    solution_cache = None
+    if args.cache is not None:
+        solution_cache = cache.SolutionCache(args.cache, args.cache_size)
+
+    path, stats = search(
+        start_state,
+        args.algorithm,
+        args.heuristic,
+        args.search_space,
+        on_expand,
+        args.verify_heuristic,
+        args.table_size,
+        metrics,
+        solution_cache,
+        not args.no_deadlock_patterns,
+        args.canonical,
+        args.compact,
+        args.engine,
+        args.queue,
+        args.visited_store,
+        int(args.visited_budget * 1024**2),
+        args.workers,
+        on_solution,
+    )
 
-        # generate new states
-        for i in range(4):
-            new_state = shift_state(current_state, i)
-            if new_state != None and new_state not in closed_set:
-                new_state_score = heuristic_function(new_state)
-
-                if (
-                    new_state_score != -1
-                ):  # For custom heuristic; -1 denotes a stuck box
-                    if args.algorithm in (
-                        "A*",
-                        "a*",
-                        "astar",
-                        "AStar",
-                        "A Star",
-                        "a star",
-                    ):
-                        new_state_score += new_state.move_count
-                    new_state.heuristic_score = new_state_score
-                    fringe.add(new_state)
-
-                closed_set.add(
-                    new_state
-                )  # Add the state to the closed list even if a box is stuck
+    if solution_cache is not None:
+        solution_cache.close()
 
-        time.sleep(args.sleep_duration)
+    if metrics is not None:
+        metrics.write(args.metrics)
 
-    if solved == True:
+    if path is not None:
+        if timed_out:
+            print("Time limit reached; the shortest solution found so far:")
         print("A solution has been found!\n")
-        path = recover_solution_path(current_state)
-        print_solution(path)
+        show_solution(args, path)
 
-    elif not fringe:
+    elif timed_out:
+        print(f"No solution found within {args.time_limit} seconds.")
+    else:
         print("The fringe has run dry; we seem to be stuck.")
 
+    if stats.visited_memory or stats.visited_disk:
+        print(
+            f"Visited set: {stats.visited_memory / (1024**2):.1f} MB in memory, "
+            f"{stats.visited_disk / (1024**2):.1f} MB on disk"
+        )
+
     runtime = time.time() - start_time
     print(f"Total runtime: {runtime:.4f} seconds")
 
@@ -2,119 +2,141 @@
 Defines the State class and its methods.
 """
 
+import actor as act
+
 
 class State:
+    # States are created by the million; __slots__ keeps each one down
+    # to a handful of references instead of a per-instance dict.
+    __slots__ = (
+        "board",
+        "robot",
+        "specific_boxes",
+        "generic_boxes",
+        "parent",
+        "last_move",
+        "heuristic_score",
+        "heuristic_estimate",
+        "move_count",
+        "zobrist",
+        "index",
+    )
+
     def __init__(
         self,
-        mapped_actors,
+        board,
         robot,
         specific_boxes,
         generic_boxes,
-        specific_storages,
-        generic_storages,
         parent=None,
         last_move=None,
         heuristic_score=0,
         move_count=0,
+        heuristic_estimate=None,
+        zobrist=None,
+        index=None,
     ):
-        # A 2D array mapping the actors out on the board
-        self.mapped_actors = mapped_actors
-        # The robot (an Actor object)
+        # The static layout of the puzzle (a Board), shared by all states
+        self.board = board
+        # Cell index of the robot
         self.robot = robot
-        # 1D lists for each type of box and storage
+        # Tuple with the cell index of each specific box, aligned with
+        # board.specific_storages
         self.specific_boxes = specific_boxes
+        # Sorted tuple with the cell indices of the generic boxes;
+        # generic boxes are interchangeable, so keeping them sorted
+        # makes equal layouts compare equal. Tuples are immutable, so
+        # a child shares them with its parent unless a box moved.
         self.generic_boxes = generic_boxes
-        self.specific_storages = specific_storages
-        self.generic_storages = generic_storages
         # Parent state
         self.parent = parent
         # The previous move used to get to this state from the parent
         self.last_move = last_move
-        # Heuristic score evaluation
+        # Heuristic score evaluation (the value the fringe orders by)
         self.heuristic_score = heuristic_score
+        # The heuristic's own estimate, without move_count, kept so that
+        # children can be scored incrementally (None until evaluated)
+        self.heuristic_estimate = heuristic_estimate
         # Number of moves used thus far to get to this state
         self.move_count = move_count
+        # Zobrist hash of the robot and box positions; children get it
+        # from their parent and update it as pieces move
+        if zobrist is None:
+            zobrist = board.zobrist(robot, specific_boxes, generic_boxes)
+        self.zobrist = zobrist
+        # Index into a SearchHistory (see history.py), for searches that
+        # record how states were reached there instead of in parent
+        self.index = index
 
     def __str__(self) -> str:
-        output = ""
-        for row in self.mapped_actors:
-            for col in row:
-                if col != None:
-                    output += col.symbol
-                else:
-                    output += " "
-            output += "\n"
-        output += str(self.robot)
+        output = self.board.render(
+            self.robot, self.specific_boxes, self.generic_boxes
+        )
+        y_position, x_position = self.board.coords(self.robot)
+        output += f"Symbol: {act.ROBOT} - at position ({y_position}, {x_position})"
         return output
 
-    def __eq__(self, other):  # Written by ChatGPT
+    def __eq__(self, other):
         if not isinstance(other, State):
             return False
 
-        if (
-            self.robot.x_position != other.robot.x_position
-            or self.robot.y_position != other.robot.y_position
-        ):
-            return False
+        return (
+            self.robot == other.robot
+            and self.specific_boxes == other.specific_boxes
+            and self.generic_boxes == other.generic_boxes
+        )
 
-        if len(self.specific_boxes) != len(other.specific_boxes):
-            return False
-        for box, other_box in zip(self.specific_boxes, other.specific_boxes):
-            if (
-                box.x_position != other_box.x_position
-                or box.y_position != other_box.y_position
-            ):
-                return False
+    def __hash__(self):
+        # Sets and dicts only fall back on __eq__ when hashes collide
+        return self.zobrist
 
-        if len(self.generic_boxes) != len(other.generic_boxes):
-            return False
-        for box, other_box in zip(self.generic_boxes, other.generic_boxes):
-            if (
-                box.x_position != other_box.x_position
-                or box.y_position != other_box.y_position
-            ):
-                return False
+    def move_robot(self, cell: int):
+        """
+        Places the robot on the given cell, keeping the hash up to date.
+        """
+        keys = self.board.robot_keys
+        self.zobrist ^= keys[self.robot] ^ keys[cell]
+        self.robot = cell
 
-        return True
+    def move_box(self, cell: int, destination: int):
+        """
+        Moves the box on the given cell to destination, keeping the hash
+        up to date. Doesn't check that the move is legal.
+        """
+        board = self.board
+        if cell in self.specific_boxes:
+            index = self.specific_boxes.index(cell)
+            boxes = list(self.specific_boxes)
+            boxes[index] = destination
+            self.specific_boxes = tuple(boxes)
+            keys = board.specific_keys[index]
+        else:
+            boxes = list(self.generic_boxes)
+            boxes.remove(cell)
+            boxes.append(destination)
+            self.generic_boxes = tuple(sorted(boxes))
+            keys = board.generic_keys
+        self.zobrist ^= keys[cell] ^ keys[destination]
 
-    def __hash__(self):  # Written by ChatGPT
-        return hash(
-            (
-                self.robot.x_position,
-                self.robot.y_position,
-                tuple((box.x_position, box.y_position) for box in self.specific_boxes),
-                tuple((box.x_position, box.y_position) for box in self.generic_boxes),
-            )
-        )
+    def has_box(self, cell: int) -> bool:
+        """
+        Check if any box occupies the given cell.
+        """
+        return cell in self.specific_boxes or cell in self.generic_boxes
 
     def is_goal(self):
         """
         Check if this is the goal state; if any box is not in its
         storage, it is not, otherwise, it is.
         """
-        solved = True
-        for i in range(len(self.specific_boxes)):
-            box = self.specific_boxes[i]
-            storage = self.specific_storages[i]
-            if (
-                box.x_position != storage.x_position
-                or box.y_position != storage.y_position
-            ):
-                solved = False
-                break
+        if self.specific_boxes != self.board.specific_storages:
+            return False
+        generic_storages = self.board.generic_storage_set
         for box in self.generic_boxes:
-            stored = False
-            for storage in self.generic_storages:
-                if (
-                    box.x_position == storage.x_position
-                    and box.y_position == storage.y_position
-                ):
-                    stored = True
-            if stored == False:
-                solved = False
-                break
+            if box not in generic_storages:
+                return False
 
-        return solved
+        return True
 
     def __lt__(self, other):
         return self.heuristic_score < other.heuristic_score
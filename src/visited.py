@@ -0,0 +1,246 @@
+"""
+Visited-set backends for the fringe-based searches. The default keeps
+the State objects themselves; the others keep only each state's robot
+and box cells packed into one integer, so a state can be freed once it
+has been expanded, and the spilling store moves those keys into a
+file-backed hash table once they outgrow a memory budget. Every store
+reports its own footprint.
+"""
+
+import mmap
+import sys
+import tempfile
+
+from state import State
+
+STORES = ("states", "keys", "mmap")
+
+# Default number of bytes the mmap store keeps in memory before spilling
+MEMORY_BUDGET = 1 << 30
+
+# Number of adds between checks of the mmap store's memory use
+CHECK_INTERVAL = 4096
+
+# Fibonacci hashing multiplier, spreading keys over the table's slots
+GOLDEN = 0x9E3779B97F4A7C15
+MASK = (1 << 64) - 1
+
+
+class KeyPacker:
+    """
+    Packs the robot and box cells of a board's states into one integer,
+    a fixed number of bits per cell. Cell 0 is always a wall, so a key
+    is never 0.
+    """
+
+    def __init__(self, board, box_count: int):
+        self.bits = (board.size - 1).bit_length()
+        # Bytes needed to store any key
+        self.width = ((box_count + 1) * self.bits + 7) // 8
+
+    def key(self, state: State) -> int:
+        bits = self.bits
+        key = state.robot
+        for box in state.specific_boxes:
+            key = key << bits | box
+        for box in state.generic_boxes:
+            key = key << bits | box
+        return key
+
+
+class StateStore(set):
+    """
+    The plain visited set: a set of the State objects themselves.
+    """
+
+    def footprint(self):
+        """
+        Returns the approximate bytes held in memory and on disk.
+        """
+        # The states' position tuples are shared with their parents, so
+        # only the states themselves are counted
+        memory = sys.getsizeof(self)
+        if self:
+            memory += len(self) * sys.getsizeof(next(iter(self)))
+        return memory, 0
+
+
+class KeyStore:
+    """
+    Visited set of packed integer keys (see KeyPacker).
+    """
+
+    def __init__(self, packer: KeyPacker):
+        self.packer = packer
+        self.keys = set()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, state: State):
+        self.keys.add(self.packer.key(state))
+
+    def __contains__(self, state: State):
+        return self.packer.key(state) in self.keys
+
+    def footprint(self):
+        memory = sys.getsizeof(self.keys)
+        if self.keys:
+            memory += len(self.keys) * sys.getsizeof(next(iter(self.keys)))
+        return memory, 0
+
+
+class HashTable:
+    """
+    Open-addressing hash table of packed keys, each stored in a slot of
+    packer.width bytes (all zero for an empty slot) of a temporary file
+    mapped into memory. Probes are linear; the table doubles into a new
+    file once it is half full.
+    """
+
+    def __init__(self, packer: KeyPacker, capacity: int, directory=None):
+        self.packer = packer
+        self.directory = directory
+        self.count = 0
+        self.open(capacity)
+
+    def open(self, capacity: int):
+        self.capacity = capacity
+        self.shift = 64 - (capacity.bit_length() - 1)
+        self.file = tempfile.TemporaryFile(dir=self.directory)
+        self.file.truncate(capacity * self.packer.width)
+        self.table = mmap.mmap(self.file.fileno(), capacity * self.packer.width)
+
+    def close(self):
+        self.table.close()
+        self.file.close()
+
+    def __len__(self):
+        return self.count
+
+    def find(self, key: int):
+        """
+        Returns the slot holding the key, or the empty slot it would go
+        in, and whether it was found.
+        """
+        width = self.packer.width
+        packed = key.to_bytes(width, "little")
+        empty = bytes(width)
+        table = self.table
+        mask = self.capacity - 1
+        slot = (hash(key) * GOLDEN & MASK) >> self.shift
+        while True:
+            start = slot * width
+            stored = table[start : start + width]
+            if stored == packed:
+                return slot, True
+            if stored == empty:
+                return slot, False
+            slot = (slot + 1) & mask
+
+    def add(self, key: int):
+        slot, found = self.find(key)
+        if found:
+            return
+        width = self.packer.width
+        self.table[slot * width : (slot + 1) * width] = key.to_bytes(width, "little")
+        self.count += 1
+        if 2 * self.count > self.capacity:
+            self.grow()
+
+    def __contains__(self, key: int):
+        return self.find(key)[1]
+
+    def grow(self):
+        width = self.packer.width
+        empty = bytes(width)
+        old_table, old_file, old_capacity = self.table, self.file, self.capacity
+        self.open(2 * old_capacity)
+        self.count = 0
+        for start in range(0, old_capacity * width, width):
+            stored = old_table[start : start + width]
+            if stored != empty:
+                self.add(int.from_bytes(stored, "little"))
+        old_table.close()
+        old_file.close()
+
+
+class SpillStore(KeyStore):
+    """
+    KeyStore that moves its keys into a HashTable once they take up more
+    than budget bytes, and keeps adding them there. The table's file is
+    deleted along with the store.
+    """
+
+    def __init__(self, packer: KeyPacker, budget: int = MEMORY_BUDGET, directory=None):
+        super().__init__(packer)
+        self.budget = budget
+        self.directory = directory
+        self.table = None
+        self.adds = 0
+
+    def __len__(self):
+        if self.table is not None:
+            return len(self.table)
+        return len(self.keys)
+
+    def add(self, state: State):
+        key = self.packer.key(state)
+        if self.table is not None:
+            self.table.add(key)
+            return
+        self.keys.add(key)
+        self.adds += 1
+        if self.adds % CHECK_INTERVAL == 0 and self.footprint()[0] > self.budget:
+            self.spill()
+
+    def __contains__(self, state: State):
+        key = self.packer.key(state)
+        if self.table is not None:
+            return key in self.table
+        return key in self.keys
+
+    def spill(self):
+        """
+        Moves every key into a HashTable, sized to stay at most half
+        full until the keys have doubled.
+        """
+        capacity = 1
+        while capacity < 4 * len(self.keys):
+            capacity *= 2
+        self.table = HashTable(self.packer, capacity, self.directory)
+        for key in self.keys:
+            self.table.add(key)
+        self.keys = set()
+
+    def footprint(self):
+        if self.table is not None:
+            return sys.getsizeof(self.keys), self.table.capacity * self.packer.width
+        return super().footprint()
+
+
+def create_packer(start_state: State) -> KeyPacker:
+    """
+    Returns a KeyPacker for states of the start state's puzzle.
+    """
+    return KeyPacker(
+        start_state.board,
+        len(start_state.specific_boxes) + len(start_state.generic_boxes),
+    )
+
+
+def create_store(
+    store: str, start_state: State, budget: int = MEMORY_BUDGET, directory=None
+):
+    """
+    Returns an empty visited set of the named kind (see STORES) for
+    states of the start state's puzzle.
+    """
+    if store not in STORES:
+        raise ValueError(f"Unknown visited store: {store}")
+    if store == "states":
+        return StateStore()
+    packer = create_packer(start_state)
+    if store == "keys":
+        return KeyStore(packer)
+    return SpillStore(packer, budget, directory)
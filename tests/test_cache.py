@@ -0,0 +1,57 @@
+import os
+
+from cache import SolutionCache
+from puzzle import initialize_puzzle, parse_level
+from search import search
+
+PUZZLES = os.path.join(os.path.dirname(__file__), "..", "puzzles")
+
+# One box is stuck in a corner, so the other one can be pushed about
+# for a while without the level ever being solved
+EXHAUSTED = [
+    "OOOOOOO",
+    "OX    O",
+    "O  X  O",
+    "O R SSO",
+    "OOOOOOO",
+]
+
+
+def test_solution_round_trip(tmp_path):
+    cache = SolutionCache(str(tmp_path / "cache.sqlite"))
+    start_state = initialize_puzzle(os.path.join(PUZZLES, "medium.txt"))
+    path, stats = search(start_state, "A*", "matching", "pushes", cache=cache)
+    assert stats.expanded > 0
+    cached_path, cached_stats = search(
+        start_state, "A*", "matching", "pushes", cache=cache
+    )
+    assert cached_stats.expanded == 0
+    assert [state.last_move for state in cached_path] == [
+        state.last_move for state in path
+    ]
+    cache.close()
+
+
+def test_dead_round_trip(tmp_path):
+    cache = SolutionCache(str(tmp_path / "cache.sqlite"))
+    start_state = parse_level(EXHAUSTED)
+    path, stats = search(start_state, "A*", "matching", "pushes", cache=cache)
+    assert path is None
+    dead = cache.dead_configurations(start_state.board)
+    # The start and every other state the search reached
+    assert len(dead) > 1
+    path, stats = search(start_state, "BFS", "matching", "pushes", cache=cache)
+    assert path is None
+    assert stats.expanded == 0
+    cache.close()
+
+
+def test_canonical_search_records_nothing_dead(tmp_path):
+    cache = SolutionCache(str(tmp_path / "cache.sqlite"))
+    start_state = parse_level(EXHAUSTED)
+    path, _ = search(
+        start_state, "A*", "matching", "pushes", cache=cache, canonical_states=True
+    )
+    assert path is None
+    assert not cache.dead_configurations(start_state.board)
+    cache.close()
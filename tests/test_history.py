@@ -0,0 +1,35 @@
+import os
+
+import history as hist
+import visited
+from puzzle import initialize_puzzle
+from search import search
+from state import State
+
+PUZZLES = os.path.join(os.path.dirname(__file__), "..", "puzzles")
+
+
+def test_zobrist_set_tells_colliding_states_apart():
+    start_state = initialize_puzzle(os.path.join(PUZZLES, "tiny.txt"))
+    closed_set = hist.ZobristSet(visited.create_packer(start_state))
+    closed_set.add(start_state)
+    # A different position given the start state's hash
+    moved = State(
+        start_state.board,
+        start_state.robot + 1,
+        start_state.specific_boxes,
+        start_state.generic_boxes,
+        zobrist=start_state.zobrist,
+    )
+    assert start_state in closed_set
+    assert moved not in closed_set
+    closed_set.add(moved)
+    assert moved in closed_set
+    assert len(closed_set) == 2
+
+
+def test_compact_search_finds_the_same_solution():
+    start_state = initialize_puzzle(os.path.join(PUZZLES, "medium.txt"))
+    path, _ = search(start_state, "A*", "matching", "pushes")
+    compact_path, _ = search(start_state, "A*", "matching", "pushes", compact=True)
+    assert len(compact_path) == len(path)
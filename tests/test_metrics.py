@@ -0,0 +1,20 @@
+import os
+
+from metrics import Metrics
+from puzzle import initialize_puzzle
+from search import search
+
+PUZZLES = os.path.join(os.path.dirname(__file__), "..", "puzzles")
+
+
+def test_dead_pushes_are_counted_only_while_collecting():
+    start_state = initialize_puzzle(os.path.join(PUZZLES, "medium.txt"))
+    metrics = Metrics()
+    search(start_state, "A*", "matching", "pushes", metrics=metrics)
+    assert metrics.dead_pushes > 0
+    assert metrics.series[-1]["dead_prunes"] >= metrics.dead_pushes
+    # The hook doesn't outlive the search, nor reach the next one
+    assert start_state.board.on_dead_push is None
+    counted = metrics.dead_pushes
+    search(start_state, "A*", "matching", "pushes")
+    assert metrics.dead_pushes == counted
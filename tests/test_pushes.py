@@ -0,0 +1,93 @@
+import os
+
+import pushes as pu
+from puzzle import initialize_puzzle, parse_level
+from search import search
+
+PUZZLES = os.path.join(os.path.dirname(__file__), "..", "puzzles")
+
+# A box at the mouth of a corridor one cell wide leading to its
+# storage, and a second box in the open, so pushing the first one
+# along is never the only push there is
+TUNNEL = [
+    "OOOOOOOOOO",
+    "O  OOOOOOO",
+    "O  RX   SO",
+    "O  OOOOOOO",
+    "O X  S   O",
+    "OOOOOOOOOO",
+]
+
+# Two boxes in an open room: every push leaves several others
+ROOM = [
+    "OOOOOOO",
+    "O     O",
+    "O X X O",
+    "O  R  O",
+    "OS   SO",
+    "OOOOOOO",
+]
+
+
+def count_pushes(path):
+    return sum(
+        parent.specific_boxes != child.specific_boxes
+        or parent.generic_boxes != child.generic_boxes
+        for parent, child in zip(path, path[1:])
+    )
+
+
+def solve(start_state, search_space):
+    path, stats = search(start_state, "A*", "matching", search_space)
+    return count_pushes(path), stats.expanded
+
+
+def box_layouts(successors, state):
+    return sorted(new_state.generic_boxes for new_state in successors(state))
+
+
+def test_macros_expand_fewer_states_on_large():
+    start_state = initialize_puzzle(os.path.join(PUZZLES, "large.txt"))
+    pushes, expanded = solve(start_state, "pushes")
+    macro_pushes, macro_expanded = solve(start_state, "macros")
+    # Folding forced pushes keeps the solution push-optimal
+    assert macro_pushes == pushes
+    assert macro_expanded < expanded
+
+
+def test_tunnel_push_is_carried_to_the_storage():
+    state = pu.normalize(parse_level(TUNNEL))
+    board = state.board
+    box = board.width * 2 + 4
+    storage = board.width * 2 + 8
+    plain = box_layouts(pu.push_successors, state)
+    macro = box_layouts(pu.macro_push_successors, state)
+    assert (box + 1, board.width * 4 + 2) in plain
+    # The other box can still be pushed, so only the tunnel rule moves
+    # this one on
+    pushed = next(
+        new_state
+        for new_state in pu.push_successors(state)
+        if box + 1 in new_state.generic_boxes
+    )
+    assert not pu.forced_push(pushed, box + 1, 1)
+    assert (storage, board.width * 4 + 2) in macro
+    assert len(macro) == len(plain)
+
+
+def test_tunnel_macros_keep_the_solution_push_optimal():
+    start_state = parse_level(TUNNEL)
+    pushes, expanded = solve(start_state, "pushes")
+    macro_pushes, macro_expanded = solve(start_state, "macros")
+    assert macro_pushes == pushes
+    assert macro_expanded < expanded
+
+
+def test_nothing_is_folded_while_other_pushes_remain():
+    state = pu.normalize(parse_level(ROOM))
+    for new_state in pu.push_successors(state):
+        # Some other push is always possible after the first
+        assert len(list(pu.push_successors(new_state))) > 1
+    assert box_layouts(pu.macro_push_successors, state) == box_layouts(
+        pu.push_successors, state
+    )
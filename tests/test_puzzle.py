@@ -0,0 +1,54 @@
+import glob
+import os
+
+import pytest
+
+from puzzle import initialize_puzzle, parse_level
+
+PUZZLES = os.path.join(os.path.dirname(__file__), "..", "puzzles")
+
+COLLECTION = """\
+; Two levels
+#####
+#@$.#
+#####
+
+Title: Second
+######
+#@ $.#
+######
+"""
+
+
+@pytest.mark.parametrize(
+    "puzzle", sorted(glob.glob(os.path.join(PUZZLES, "*.txt")))
+)
+def test_bundled_puzzles_parse(puzzle):
+    initialize_puzzle(puzzle)
+
+
+def test_unenclosed_level_is_rejected():
+    with pytest.raises(ValueError, match="enclosed"):
+        parse_level(["OOOOO", "OR XS", "OOOOO"])
+
+
+def test_duplicate_specific_box_is_rejected():
+    with pytest.raises(ValueError, match="more than one box A"):
+        parse_level(["OOOOOOO", "ORA aAO", "OOOOOOO"])
+
+
+def test_unreachable_pieces_are_rejected():
+    with pytest.raises(ValueError, match="can't reach"):
+        parse_level(["OOOOOOO", "ORXSOXO", "OOOOOSO", "OOOOOOO"])
+
+
+def test_collection_levels_are_picked_by_number(tmp_path):
+    collection = tmp_path / "levels.xsb"
+    collection.write_text(COLLECTION)
+    first = initialize_puzzle(str(collection))
+    second = initialize_puzzle(f"{collection}#2")
+    assert first.board.width == 5
+    assert second.board.width == 6
+    for number in (0, 3):
+        with pytest.raises(ValueError, match=f"has no level {number}"):
+            initialize_puzzle(f"{collection}#{number}")